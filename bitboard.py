@@ -0,0 +1,145 @@
+"""Bitboard helpers and attack tables built at import time.
+
+A bitboard is a python int using bit n for square n (a1 = bit 0, h8 = bit 63).
+"""
+
+from board import (WHITE, BLACK, KNIGHT_TARGETS, KING_TARGETS,
+                   DIAGONAL_RAYS, LINEAR_RAYS)
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_4 = RANK_1 << 24
+RANK_5 = RANK_1 << 32
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+# light and dark squares (a1 is dark)
+LIGHT_SQUARES = 0x55AA55AA55AA55AA
+DARK_SQUARES = FULL ^ LIGHT_SQUARES
+
+# single bit of every square
+BIT = tuple(1 << sq for sq in range(64))
+
+
+def lsb(bb):
+    # index of the lowest set bit
+    return (bb & -bb).bit_length() - 1
+
+
+def msb(bb):
+    # index of the highest set bit
+    return bb.bit_length() - 1
+
+
+def popcount(bb):
+    return bin(bb).count("1")
+
+
+def squares_of(bb):
+    # yield the index of every set bit, lowest first
+    while bb:
+        b = bb & -bb
+        yield b.bit_length() - 1
+        bb ^= b
+
+
+def _to_bitboard(squares):
+    bb = 0
+    for sq in squares:
+        bb |= 1 << sq
+    return bb
+
+
+KNIGHT_ATTACKS = tuple(_to_bitboard(targets) for targets in KNIGHT_TARGETS)
+KING_ATTACKS = tuple(_to_bitboard(targets) for targets in KING_TARGETS)
+
+# squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = {
+    WHITE: tuple(((BIT[sq] & ~FILE_A) << 7 | (BIT[sq] & ~FILE_H) << 9) & FULL
+                 for sq in range(64)),
+    BLACK: tuple((BIT[sq] & ~FILE_A) >> 9 | (BIT[sq] & ~FILE_H) >> 7
+                 for sq in range(64)),
+}
+
+# rays running from every square towards the edge of the board, excluding
+# the square itself; the first blocker on a ray is found with lsb() on the
+# rays pointing to higher squares and with msb() on the others
+RAY_NE, RAY_SE, RAY_SW, RAY_NW = (
+    tuple(_to_bitboard(DIAGONAL_RAYS[sq][d]) for sq in range(64)) for d in range(4))
+RAY_N, RAY_E, RAY_S, RAY_W = (
+    tuple(_to_bitboard(LINEAR_RAYS[sq][d]) for sq in range(64)) for d in range(4))
+
+BISHOP_RAYS = tuple(RAY_NE[sq] | RAY_SE[sq] | RAY_SW[sq] | RAY_NW[sq]
+                    for sq in range(64))
+ROOK_RAYS = tuple(RAY_N[sq] | RAY_E[sq] | RAY_S[sq] | RAY_W[sq]
+                  for sq in range(64))
+
+
+def _between():
+    # squares strictly between two squares on a common line, 0 if not aligned
+    table = [[0] * 64 for sq in range(64)]
+    for sq in range(64):
+        for ray in DIAGONAL_RAYS[sq] + LINEAR_RAYS[sq]:
+            squares = 0
+            for target in ray:
+                table[sq][target] = squares
+                squares |= 1 << target
+    return tuple(tuple(row) for row in table)
+
+
+BETWEEN = _between()
+
+
+def bishop_attacks(sq, occupied):
+    attacks = RAY_NE[sq]
+    blockers = attacks & occupied
+    if blockers:
+        attacks ^= RAY_NE[(blockers & -blockers).bit_length() - 1]
+    ray = RAY_NW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_NW[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_SE[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SE[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_SW[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_SW[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def rook_attacks(sq, occupied):
+    attacks = RAY_N[sq]
+    blockers = attacks & occupied
+    if blockers:
+        attacks ^= RAY_N[(blockers & -blockers).bit_length() - 1]
+    ray = RAY_E[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_E[(blockers & -blockers).bit_length() - 1]
+    attacks |= ray
+    ray = RAY_S[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_S[blockers.bit_length() - 1]
+    attacks |= ray
+    ray = RAY_W[sq]
+    blockers = ray & occupied
+    if blockers:
+        ray ^= RAY_W[blockers.bit_length() - 1]
+    return attacks | ray
+
+
+def queen_attacks(sq, occupied):
+    return bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)
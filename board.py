@@ -0,0 +1,436 @@
+"""Compact array-backed chess board.
+
+Squares are numbered 0..63 with a1 = 0, b1 = 1, ..., h8 = 63, and every
+square holds a small integer piece code (color bit | piece type). The board
+also keeps one bitboard per piece code and a Zobrist hash, both updated on
+every piece placement.
+"""
+
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EP_KEYS
+
+# piece colors (stored in bit 3 of the piece code)
+WHITE = 0
+BLACK = 8
+
+# piece types (stored in the low 3 bits of the piece code)
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+
+# masks to split a piece code into color and type
+COLOR_MASK = 8
+TYPE_MASK = 7
+
+# castling rights bits
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+# encoded moves: source square in bits 0-5, destination in bits 6-11, the
+# kind of move in bits 12-13 and, for promotions, the new piece type minus
+# KNIGHT in bits 14-15. Castling is encoded as the king taking its own rook,
+# which stays unambiguous in Chess960.
+NORMAL = 0
+PROMOTION = 1 << 12
+EN_PASSANT = 2 << 12
+CASTLING = 3 << 12
+MOVE_KIND_MASK = 3 << 12
+
+# mapping of color codes to the names used by the rest of the game
+COLOR_NAMES = {WHITE: "white", BLACK: "black"}
+COLOR_CODES = {"white": WHITE, "black": BLACK}
+
+# mapping of piece types to names
+TYPE_NAMES = {
+    PAWN:   "pawn",
+    KNIGHT: "knight",
+    BISHOP: "bishop",
+    ROOK:   "rook",
+    QUEEN:  "queen",
+    KING:   "king"
+}
+TYPE_CODES = {name: code for code, name in TYPE_NAMES.items()}
+
+# piece code -> piece name ("white_pawn", ...); index 0 is the empty square
+PIECE_NAMES = [""] * 16
+for _color, _color_name in COLOR_NAMES.items():
+    for _type, _type_name in TYPE_NAMES.items():
+        PIECE_NAMES[_color | _type] = _color_name + "_" + _type_name
+# piece name -> piece code
+PIECE_CODES = {name: code for code, name in enumerate(PIECE_NAMES) if name}
+PIECE_CODES[""] = EMPTY
+
+
+def square(x, y):
+    # convert board coordinates (x = file from the left, y = row from the top)
+    # to a square index
+    return ((7 - y) << 3) | x
+
+
+def coords(sq):
+    # convert a square index to [x, y] board coordinates
+    return [sq & 7, 7 - (sq >> 3)]
+
+
+def square_name(sq):
+    # name of a square in algebraic notation, e.g. "e4"
+    return chr(97 + (sq & 7)) + str((sq >> 3) + 1)
+
+
+def castling_targets(king, rook):
+    # destination squares (king, rook) of castling with the rook on the given
+    # square: g and f file on the h side of the king, c and d file otherwise
+    back = king & 56
+    if rook > king:
+        return back + 6, back + 5
+    return back + 2, back + 3
+
+
+def color_of(piece):
+    return piece & COLOR_MASK
+
+
+def type_of(piece):
+    return piece & TYPE_MASK
+
+
+def _targets(steps):
+    # precompute the squares reachable from every square with a single step
+    table = []
+    for sq in range(64):
+        file, rank = sq & 7, sq >> 3
+        targets = []
+        for df, dr in steps:
+            f, r = file + df, rank + dr
+            if 0 <= f < 8 and 0 <= r < 8:
+                targets.append((r << 3) | f)
+        table.append(tuple(targets))
+    return tuple(table)
+
+
+def _rays(directions):
+    # precompute, for every square, the squares along each direction
+    # ordered from nearest to furthest
+    table = []
+    for sq in range(64):
+        file, rank = sq & 7, sq >> 3
+        rays = []
+        for df, dr in directions:
+            ray = []
+            f, r = file + df, rank + dr
+            while 0 <= f < 8 and 0 <= r < 8:
+                ray.append((r << 3) | f)
+                f, r = f + df, r + dr
+            rays.append(tuple(ray))
+        table.append(tuple(rays))
+    return tuple(table)
+
+
+KNIGHT_TARGETS = _targets([(1, 2), (2, 1), (2, -1), (1, -2),
+                           (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_TARGETS = _targets([(0, 1), (1, 1), (1, 0), (1, -1),
+                         (0, -1), (-1, -1), (-1, 0), (-1, 1)])
+DIAGONAL_RAYS = _rays([(1, 1), (1, -1), (-1, -1), (-1, 1)])
+LINEAR_RAYS = _rays([(0, 1), (1, 0), (0, -1), (-1, 0)])
+
+# contents of an empty board, for clear()
+_EMPTY_SQUARES = (EMPTY,) * 64
+_NO_RIGHTS = (0,) * 64
+_NO_BITBOARDS = (0,) * 16
+_NO_ROOKS = (None,) * 16
+
+
+class Board(object):
+    def __init__(self):
+        # piece code of every square
+        self.squares = [EMPTY] * 64
+        # one bitboard per piece code; the unused codes WHITE and BLACK
+        # (color bit with no piece type) hold the occupancy of each side
+        self.bitboards = [0] * 16
+        # square of each king, kept up to date on every move
+        self.kings = {WHITE: None, BLACK: None}
+        # color to move
+        self.side = WHITE
+        # castling rights bits and the starting square of the rook that
+        # belongs to each right (any file in Chess960)
+        self.castling = 0
+        self.castle_rooks = [None] * 16
+        # castling rights lost when a move starts or ends on each square
+        self.castle_mask = [0] * 64
+        # square a pawn can be captured on en passant, or None
+        self.ep = None
+        # plies since the last capture or pawn move, and the move number
+        self.halfmove = 0
+        self.fullmove = 1
+        # Zobrist hash of the position
+        self.hash = 0
+
+    def clear(self):
+        # lists are emptied in place, so references to them stay valid
+        self.squares[:] = _EMPTY_SQUARES
+        self.castle_mask[:] = _NO_RIGHTS
+        self.bitboards[:] = _NO_BITBOARDS
+        self.castle_rooks[:] = _NO_ROOKS
+        self.kings[WHITE] = None
+        self.kings[BLACK] = None
+        self.side = WHITE
+        self.castling = 0
+        self.ep = None
+        self.halfmove = 0
+        self.fullmove = 1
+        self.hash = 0
+
+    def setup(self, back_rank):
+        """Place both armies, given the back rank piece names from a to h"""
+        self.clear()
+        for x, piece in enumerate(back_rank):
+            piece_type = TYPE_CODES[piece]
+            # white pieces on rank 1 and 2
+            self.put_piece(x, WHITE | piece_type)
+            self.put_piece(8 + x, WHITE | PAWN)
+            # black pieces on rank 8 and 7
+            self.put_piece(56 + x, BLACK | piece_type)
+            self.put_piece(48 + x, BLACK | PAWN)
+
+        # the rook on each side of the king can castle
+        rooks = [x for x, piece in enumerate(back_rank) if piece == "rook"]
+        self.set_castling(ALL_CASTLING, {
+            WHITE_QUEENSIDE: rooks[0], WHITE_KINGSIDE: rooks[-1],
+            BLACK_QUEENSIDE: 56 + rooks[0], BLACK_KINGSIDE: 56 + rooks[-1]})
+
+    def set_castling(self, rights, rooks):
+        """Set the castling rights and the rook square of each right"""
+        self.hash ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[rights]
+        self.castling = rights
+        self.castle_mask[:] = _NO_RIGHTS
+        for right in (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE):
+            rook = rooks.get(right)
+            self.castle_rooks[right] = rook
+            if rook is not None:
+                self.castle_mask[rook] |= right
+        # a king move gives up both rights of its side
+        for color, both in ((WHITE, WHITE_KINGSIDE | WHITE_QUEENSIDE),
+                            (BLACK, BLACK_KINGSIDE | BLACK_QUEENSIDE)):
+            if self.kings[color] is not None:
+                self.castle_mask[self.kings[color]] |= both
+
+    def set_side(self, side):
+        if side != self.side:
+            self.hash ^= SIDE_KEY
+            self.side = side
+
+    def set_ep(self, ep):
+        if self.ep is not None:
+            self.hash ^= EP_KEYS[self.ep & 7]
+        self.ep = ep
+        if ep is not None:
+            self.hash ^= EP_KEYS[ep & 7]
+
+    def compute_hash(self):
+        """Zobrist hash computed from scratch, to check the incremental one"""
+        h = 0
+        for sq, piece in enumerate(self.squares):
+            if piece != EMPTY:
+                h ^= PIECE_KEYS[piece][sq]
+        if self.side == BLACK:
+            h ^= SIDE_KEY
+        if self.ep is not None:
+            h ^= EP_KEYS[self.ep & 7]
+        return h ^ CASTLING_KEYS[self.castling]
+
+    def piece_at(self, sq):
+        return self.squares[sq]
+
+    def occupied(self):
+        return self.bitboards[WHITE] | self.bitboards[BLACK]
+
+    def put_piece(self, sq, piece):
+        # place a piece on an empty square
+        b = 1 << sq
+        self.squares[sq] = piece
+        self.bitboards[piece] |= b
+        self.bitboards[piece & COLOR_MASK] |= b
+        self.hash ^= PIECE_KEYS[piece][sq]
+        if piece & TYPE_MASK == KING:
+            self.kings[piece & COLOR_MASK] = sq
+
+    def remove_piece(self, sq):
+        piece = self.squares[sq]
+        if piece != EMPTY:
+            b = 1 << sq
+            self.squares[sq] = EMPTY
+            self.bitboards[piece] ^= b
+            self.bitboards[piece & COLOR_MASK] ^= b
+            self.hash ^= PIECE_KEYS[piece][sq]
+            if piece & TYPE_MASK == KING:
+                self.kings[piece & COLOR_MASK] = None
+        return piece
+
+    def move_piece(self, src, des):
+        # move the piece on src to des and return the captured piece code
+        squares = self.squares
+        bitboards = self.bitboards
+        piece = squares[src]
+        captured = squares[des]
+        h = self.hash
+        if captured != EMPTY:
+            b = 1 << des
+            bitboards[captured] ^= b
+            bitboards[captured & COLOR_MASK] ^= b
+            h ^= PIECE_KEYS[captured][des]
+            if captured & TYPE_MASK == KING:
+                self.kings[captured & COLOR_MASK] = None
+        b = (1 << src) | (1 << des)
+        bitboards[piece] ^= b
+        bitboards[piece & COLOR_MASK] ^= b
+        keys = PIECE_KEYS[piece]
+        self.hash = h ^ keys[src] ^ keys[des]
+        squares[des] = piece
+        squares[src] = EMPTY
+        if piece & TYPE_MASK == KING:
+            self.kings[piece & COLOR_MASK] = des
+        return captured
+
+    def undo_move(self, src, des, captured):
+        # take back move_piece(src, des), restoring the captured piece
+        squares = self.squares
+        bitboards = self.bitboards
+        piece = squares[des]
+        b = (1 << src) | (1 << des)
+        bitboards[piece] ^= b
+        bitboards[piece & COLOR_MASK] ^= b
+        keys = PIECE_KEYS[piece]
+        h = self.hash ^ keys[src] ^ keys[des]
+        squares[src] = piece
+        squares[des] = captured
+        if piece & TYPE_MASK == KING:
+            self.kings[piece & COLOR_MASK] = src
+        if captured != EMPTY:
+            b = 1 << des
+            bitboards[captured] ^= b
+            bitboards[captured & COLOR_MASK] ^= b
+            h ^= PIECE_KEYS[captured][des]
+            if captured & TYPE_MASK == KING:
+                self.kings[captured & COLOR_MASK] = des
+        self.hash = h
+
+    def make_move(self, move):
+        """Play an encoded move for the side to move
+
+        Returns the state unmake_move needs to take the move back; its first
+        item is the captured piece code.
+        """
+        src = move & 63
+        des = (move >> 6) & 63
+        kind = move & MOVE_KIND_MASK
+        castling = self.castling
+        ep = self.ep
+        halfmove = self.halfmove
+        h = self.hash
+        piece = self.squares[src]
+        if kind == NORMAL:
+            captured = self.move_piece(src, des)
+        elif kind == PROMOTION:
+            captured = self.move_piece(src, des)
+            self.remove_piece(des)
+            self.put_piece(des, (piece & COLOR_MASK) | (KNIGHT + ((move >> 14) & 3)))
+        elif kind == EN_PASSANT:
+            # the captured pawn stands next to the destination, on the
+            # rank the capturing pawn came from
+            captured = self.remove_piece(des ^ 8)
+            self.move_piece(src, des)
+        else:
+            # take both pieces off first, the king and rook may swap squares
+            captured = EMPTY
+            king_des, rook_des = castling_targets(src, des)
+            rook = self.remove_piece(des)
+            self.remove_piece(src)
+            self.put_piece(king_des, piece)
+            self.put_piece(rook_des, rook)
+        undo = (captured, castling, ep, h, halfmove)
+        h = self.hash ^ SIDE_KEY
+
+        if captured != EMPTY or piece & TYPE_MASK == PAWN:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+
+        # the en passant square only lasts for one move
+        if ep is not None:
+            h ^= EP_KEYS[ep & 7]
+            self.ep = None
+        # after a double step, record the square passed over if an enemy
+        # pawn stands next to the destination and could take en passant
+        if piece & TYPE_MASK == PAWN and (des - src == 16 or src - des == 16):
+            enemy_pawn = piece ^ COLOR_MASK
+            file = des & 7
+            if ((file > 0 and self.squares[des - 1] == enemy_pawn)
+                    or (file < 7 and self.squares[des + 1] == enemy_pawn)):
+                self.ep = (src + des) >> 1
+                h ^= EP_KEYS[file]
+
+        # moving the king or a rook, or capturing a rook, loses castling rights
+        rights = castling & ~(self.castle_mask[src] | self.castle_mask[des])
+        if rights != castling:
+            h ^= CASTLING_KEYS[castling] ^ CASTLING_KEYS[rights]
+            self.castling = rights
+
+        self.hash = h
+        if self.side == BLACK:
+            self.fullmove += 1
+        self.side ^= BLACK
+        return undo
+
+    def unmake_move(self, move, undo):
+        # take back make_move(move), given the state it returned
+        captured, self.castling, self.ep, h, self.halfmove = undo
+        self.side ^= BLACK
+        if self.side == BLACK:
+            self.fullmove -= 1
+        src = move & 63
+        des = (move >> 6) & 63
+        kind = move & MOVE_KIND_MASK
+        if kind == NORMAL:
+            self.undo_move(src, des, captured)
+        elif kind == PROMOTION:
+            self.remove_piece(des)
+            self.put_piece(des, self.side | PAWN)
+            self.undo_move(src, des, captured)
+        elif kind == EN_PASSANT:
+            self.undo_move(src, des, EMPTY)
+            self.put_piece(des ^ 8, captured)
+        else:
+            king_des, rook_des = castling_targets(src, des)
+            king = self.remove_piece(king_des)
+            rook = self.remove_piece(rook_des)
+            self.put_piece(src, king)
+            self.put_piece(des, rook)
+        self.hash = h
+
+    def find(self, piece):
+        # square of the first occurrence of a piece, or None
+        bb = self.bitboards[piece]
+        if bb:
+            return (bb & -bb).bit_length() - 1
+        return None
+
+    def copy(self):
+        board = Board()
+        board.squares = self.squares[:]
+        board.bitboards = self.bitboards[:]
+        board.kings = dict(self.kings)
+        board.side = self.side
+        board.castling = self.castling
+        board.castle_rooks = self.castle_rooks[:]
+        board.castle_mask = self.castle_mask[:]
+        board.ep = self.ep
+        board.halfmove = self.halfmove
+        board.fullmove = self.fullmove
+        board.hash = self.hash
+        return board
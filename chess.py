@@ -1,15 +1,99 @@
-import pygame
-from pygame.locals import *
-import random
+from collections.abc import Mapping
 
 from piece import Piece
 from utils import Utils
+from board import (EMPTY, WHITE, BLACK, COLOR_MASK, COLOR_CODES, PIECE_NAMES, PIECE_CODES,
+                   square, coords, square_name)
+from movegen import move_src, move_des
+from rules import Rules
+from resources import ResourceCache
+
+# highlight colors of the selected piece and its moves: black pieces are
+# highlighted in green, white pieces in blue
+HIGHLIGHT_COLORS = {
+    BLACK: (0, 194, 39, 170),
+    WHITE: (28, 21, 212, 170)
+}
+
+
+class _SquareView(object):
+    # [piece name, selected, [x, y]] view of a single board square
+    def __init__(self, chess, sq):
+        self.chess = chess
+        self.sq = sq
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter([self[0], self[1], self[2]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index == 0:
+            return PIECE_NAMES[self.chess.board.squares[self.sq]]
+        if index == 1:
+            return self.chess.selected == self.sq
+        if index == 2:
+            return coords(self.sq)
+        raise IndexError(index)
+
+    def __setitem__(self, index, value):
+        if index == 0:
+            self.chess.board.remove_piece(self.sq)
+            if value:
+                self.chess.board.put_piece(self.sq, PIECE_CODES[value])
+        elif index == 1:
+            if value:
+                self.chess.selected = self.sq
+            elif self.chess.selected == self.sq:
+                self.chess.selected = None
+        else:
+            raise IndexError(index)
+
+
+class _FileView(Mapping):
+    # rank number -> square view for a single file
+    def __init__(self, chess, x):
+        self.chess = chess
+        self.x = x
+
+    def __getitem__(self, rank):
+        if not isinstance(rank, int) or not 1 <= rank <= 8:
+            raise KeyError(rank)
+        return _SquareView(self.chess, ((rank - 1) << 3) | self.x)
+
+    def __iter__(self):
+        return iter(range(8, 0, -1))
+
+    def __len__(self):
+        return 8
+
+
+class PieceLocationView(Mapping):
+    """Read/write view of the board in the old piece_location layout
+
+    piece_location[file char][rank number] gives [piece name, selected, [x, y]]
+    """
 
-import time
+    def __init__(self, chess):
+        self.chess = chess
 
+    def __getitem__(self, file):
+        if not isinstance(file, str) or len(file) != 1 or not "a" <= file <= "h":
+            raise KeyError(file)
+        return _FileView(self.chess, ord(file) - 97)
 
-class Chess(object):
-    def __init__(self, screen, pieces_src, square_coords, square_length):
+    def __iter__(self):
+        return iter("abcdefgh")
+
+    def __len__(self):
+        return 8
+
+
+class Chess(Rules):
+    def __init__(self, screen, pieces_src, square_coords, square_length, cache=None):
         # display surface
         self.screen = screen
         # create an object of class to show chess pieces on the board
@@ -18,9 +102,8 @@ class Chess(object):
         self.board_locations = square_coords
         # length of the side of a chess board square
         self.square_length = square_length
-        # dictionary to keeping track of player turn
-        self.turn = {"white": 1,
-                     "black": 0}
+        # fonts and highlight overlays, shared with the game when given
+        self.cache = cache if cache is not None else ResourceCache()
 
         # list containing possible moves for the selected piece
         self.moves = []
@@ -43,88 +126,39 @@ class Chess(object):
             "black_queen":  7
         }
 
-        # list containing captured pieces
-        self.captured = []
-        #
-        self.winner = ""
+        # square of the currently selected piece
+        self.selected = None
+        # compatibility view in the old {file: {rank: [name, selected, [x, y]]}} layout
+        self.piece_location = PieceLocationView(self)
+
+        # set up the rules engine and the first position
+        Rules.__init__(self)
+
+    def reset(self, back_rank=None, position_id=None):
+        self.moves = []
+        self.selected = None
+        Rules.reset(self, back_rank, position_id)
+
+    def load_fen(self, text):
+        Rules.load_fen(self, text)
+        self.moves = []
+        self.selected = None
 
-        self.reset()
+    def undo(self):
+        # drop the selection, it may belong to the position being left
+        self.moves = []
+        self.selected = None
+        return Rules.undo(self)
 
-    def reset(self):
+    def redo(self):
         self.moves = []
-        self.captured = []
-        self.winner = ""
-
-        self.piece_location = {}
-        x = 0
-        for i in range(97, 105):  # 'a' to 'h'
-            a = 8
-            y = 0
-            self.piece_location[chr(i)] = {}
-            while a > 0:
-                self.piece_location[chr(i)][a] = ["", False, [x, y]]
-                a -= 1
-                y += 1
-            x += 1
-
-        # === Generate Chess960 Starting Position ===
-        back_rank = [None] * 8
-
-        # 1. Place bishops on opposite-colored squares
-        bishop1 = random.choice([0, 2, 4, 6])
-        bishop2 = random.choice([1, 3, 5, 7])
-        back_rank[bishop1] = "bishop"
-        back_rank[bishop2] = "bishop"
-
-        # 2. Place queen in one of the remaining slots
-        remaining = [i for i in range(8) if back_rank[i] is None]
-        queen = random.choice(remaining)
-        back_rank[queen] = "queen"
-
-        # 3. Place knights in two of the remaining slots
-        remaining = [i for i in range(8) if back_rank[i] is None]
-        knight1, knight2 = random.sample(remaining, 2)
-        back_rank[knight1] = "knight"
-        back_rank[knight2] = "knight"
-
-        # 4. Place rooks and king such that king is between the rooks
-        remaining = [i for i in range(8) if back_rank[i] is None]
-        remaining.sort()
-        rook1, king, rook2 = remaining[0], remaining[1], remaining[2]
-        back_rank[rook1] = "rook"
-        back_rank[king] = "king"
-        back_rank[rook2] = "rook"
-
-        # === Place pieces on board ===
-        for idx, piece in enumerate(back_rank):
-            file_char = chr(97 + idx)  # 'a' to 'h'
-            # White pieces on rank 1 and 2
-            self.piece_location[file_char][1][0] = "white_" + piece
-            self.piece_location[file_char][2][0] = "white_pawn"
-            # Black pieces on rank 8 and 7
-            self.piece_location[file_char][8][0] = "black_" + piece
-            self.piece_location[file_char][7][0] = "black_pawn"
-
-        # Reset turn to white
-        self.turn = {"white": 1, "black": 0}
+        self.selected = None
+        return Rules.redo(self)
 
     #
 
     def play_turn(self):
-        # white color
-        white_color = (255, 255, 255)
-        # create fonts for texts
-        small_font = pygame.font.SysFont("comicsansms", 20)
-        # create text to be shown on the game menu
-        if self.turn["black"]:
-            turn_text = small_font.render("Turn: Black", True, white_color)
-        elif self.turn["white"]:
-            turn_text = small_font.render("Turn: White", True, white_color)
-
-        # show welcome text
-        self.screen.blit(turn_text,
-                         ((self.screen.get_width() - turn_text.get_width()) // 2,
-                          10))
+        # the turn label is drawn by the renderer
 
         # let player with black piece play
         if (self.turn["black"]):
@@ -133,301 +167,69 @@ class Chess(object):
         elif (self.turn["white"]):
             self.move_piece("white")
 
-        # After turn, check for checkmate or stalemate
-        current = "white" if self.turn["white"] else "black"
-        if not self.has_legal_moves(current):
-            if self.is_in_check(current):
-                self.winner = "Black" if current == "white" else "White"
-                print(f"{self.winner} wins by checkmate!")
-            else:
-                self.winner = "Draw"
-                print("Stalemate!")
+        # After turn, check for checkmate, stalemate and draws
+        result = self.check_game_end()
+        if result == "checkmate":
+            print(f"{self.winner} wins by checkmate!")
+        elif result == "stalemate":
+            print("Stalemate!")
+        elif result:
+            print(f"Draw by {result}!")
+
+    def highlights(self):
+        # square -> highlight color of the selected piece and its moves
+        if self.selected is None or self.board.squares[self.selected] == EMPTY:
+            return {}
+        color = HIGHLIGHT_COLORS[self.board.squares[self.selected] & COLOR_MASK]
+        squares = {self.selected: color}
+        for x_coord, y_coord in self.moves:
+            if x_coord >= 0 and y_coord >= 0 and x_coord < 8 and y_coord < 8:
+                squares[square(x_coord, y_coord)] = color
+        return squares
 
     # method to draw pieces on the chess board
     def draw_pieces(self):
-        transparent_green = (0, 194, 39, 170)
-        transparent_blue = (28, 21, 212, 170)
-
-        # create a transparent surface
-        surface = pygame.Surface(
-            (self.square_length, self.square_length), pygame.SRCALPHA)
-        surface.fill(transparent_green)
-
-        surface1 = pygame.Surface(
-            (self.square_length, self.square_length), pygame.SRCALPHA)
-        surface1.fill(transparent_blue)
-
-        # loop to change background color of selected piece
-        for val in self.piece_location.values():
-            for value in val.values():
-                # name of the piece in the current location
-                piece_name = value[0]
-                # x, y coordinates of the current piece
-                piece_coord_x, piece_coord_y = value[2]
-
-                # change background color of piece if it is selected
-                if value[1] and len(value[0]) > 5:
-                    # if the piece selected is a black piece
-                    if value[0][:5] == "black":
-                        self.screen.blit(
-                            surface, self.board_locations[piece_coord_x][piece_coord_y])
-                        if len(self.moves) > 0:
-                            for move in self.moves:
-                                x_coord = move[0]
-                                y_coord = move[1]
-                                if x_coord >= 0 and y_coord >= 0 and x_coord < 8 and y_coord < 8:
-                                    self.screen.blit(
-                                        surface, self.board_locations[x_coord][y_coord])
-                    # if the piece selected is a white piece
-                    elif value[0][:5] == "white":
-                        self.screen.blit(
-                            surface1, self.board_locations[piece_coord_x][piece_coord_y])
-                        if len(self.moves) > 0:
-                            for move in self.moves:
-                                x_coord = move[0]
-                                y_coord = move[1]
-                                if x_coord >= 0 and y_coord >= 0 and x_coord < 8 and y_coord < 8:
-                                    self.screen.blit(
-                                        surface1, self.board_locations[x_coord][y_coord])
+        # change background color of the selected piece and its moves
+        for sq, color in self.highlights().items():
+            # transparent surface of the highlight color
+            overlay = self.cache.overlay(color, self.square_length)
+            piece_coord_x, piece_coord_y = coords(sq)
+            self.screen.blit(
+                overlay, self.board_locations[piece_coord_x][piece_coord_y])
 
         # draw all chess pieces
-        for val in self.piece_location.values():
-            for value in val.values():
-                # name of the piece in the current location
-                piece_name = value[0]
+        for sq, piece in enumerate(self.board.squares):
+            # check if there is a piece at the square
+            if piece != EMPTY:
                 # x, y coordinates of the current piece
-                piece_coord_x, piece_coord_y = value[2]
-                # check if there is a piece at the square
-                if (len(value[0]) > 1):
-                    # draw piece on the board
-                    self.chess_pieces.draw(self.screen, piece_name,
-                                           self.board_locations[piece_coord_x][piece_coord_y])
-
-    # method to find the possible moves of the selected piece
-
-    def possible_moves(self, piece_name, piece_coord, simulate=False):
-        # list to store possible moves of the selected piece
-        positions = []
-        # find the possible locations to put a piece
-        if len(piece_name) > 0:
-            # get x, y coordinate
-            x_coord, y_coord = piece_coord
-            # calculate moves for bishop
-            if piece_name[6:] == "bishop":
-                positions = self.diagonal_moves(
-                    positions, piece_name, piece_coord)
-
-            # calculate moves for pawn
-            elif piece_name[6:] == "pawn":
-                # convert list index to dictionary key
-                columnChar = chr(97 + x_coord)
-                rowNo = 8 - y_coord
-
-                # calculate moves for white pawn
-                if piece_name == "black_pawn":
-                    if y_coord + 1 < 8:
-                        # get row in front of black pawn
-                        rowNo = rowNo - 1
-                        front_piece = self.piece_location[columnChar][rowNo][0]
-
-                        # pawns cannot move when blocked by another another pawn
-                        if (front_piece[6:] != "pawn"):
-                            positions.append([x_coord, y_coord+1])
-                            # black pawns can move two positions ahead for first move
-                            if y_coord < 2:
-                                positions.append([x_coord, y_coord+2])
-
-                        # EM PASSANT
-                        # diagonal to the left
-                        if x_coord - 1 >= 0 and y_coord + 1 < 8:
-                            x = x_coord - 1
-                            y = y_coord + 1
-
-                            # convert list index to dictionary key
-                            columnChar = chr(97 + x)
-                            rowNo = 8 - y
-                            to_capture = self.piece_location[columnChar][rowNo]
-
-                            if (to_capture[0][:5] == "white"):
-                                positions.append([x, y])
-
-                        # diagonal to the right
-                        if x_coord + 1 < 8 and y_coord + 1 < 8:
-                            x = x_coord + 1
-                            y = y_coord + 1
-
-                            # convert list index to dictionary key
-                            columnChar = chr(97 + x)
-                            rowNo = 8 - y
-                            to_capture = self.piece_location[columnChar][rowNo]
-
-                            if (to_capture[0][:5] == "white"):
-                                positions.append([x, y])
-
-                # calculate moves for white pawn
-                elif piece_name == "white_pawn":
-                    if y_coord - 1 >= 0:
-                        # get row in front of black pawn
-                        rowNo = rowNo + 1
-                        front_piece = self.piece_location[columnChar][rowNo][0]
-
-                        # pawns cannot move when blocked by another another pawn
-                        if (front_piece[6:] != "pawn"):
-                            positions.append([x_coord, y_coord-1])
-                            # black pawns can move two positions ahead for first move
-                            if y_coord > 5:
-                                positions.append([x_coord, y_coord-2])
-
-                        # EM PASSANT
-                        # diagonal to the left
-                        if x_coord - 1 >= 0 and y_coord - 1 >= 0:
-                            x = x_coord - 1
-                            y = y_coord - 1
-
-                            # convert list index to dictionary key
-                            columnChar = chr(97 + x)
-                            rowNo = 8 - y
-                            to_capture = self.piece_location[columnChar][rowNo]
-
-                            if (to_capture[0][:5] == "black"):
-                                positions.append([x, y])
-
-                        # diagonal to the right
-                        if x_coord + 1 < 8 and y_coord - 1 >= 0:
-                            x = x_coord + 1
-                            y = y_coord - 1
-
-                            # convert list index to dictionary key
-                            columnChar = chr(97 + x)
-                            rowNo = 8 - y
-                            to_capture = self.piece_location[columnChar][rowNo]
-
-                            if (to_capture[0][:5] == "black"):
-                                positions.append([x, y])
-
-            # calculate moves for rook
-            elif piece_name[6:] == "rook":
-                # find linear moves
-                positions = self.linear_moves(
-                    positions, piece_name, piece_coord)
-
-            # calculate moves for knight
-            elif piece_name[6:] == "knight":
-                # left positions
-                if (x_coord - 2) >= 0:
-                    if (y_coord - 1) >= 0:
-                        positions.append([x_coord-2, y_coord-1])
-                    if (y_coord + 1) < 8:
-                        positions.append([x_coord-2, y_coord+1])
-                # top positions
-                if (y_coord - 2) >= 0:
-                    if (x_coord - 1) >= 0:
-                        positions.append([x_coord-1, y_coord-2])
-                    if (x_coord + 1) < 8:
-                        positions.append([x_coord+1, y_coord-2])
-                # right positions
-                if (x_coord + 2) < 8:
-                    if (y_coord - 1) >= 0:
-                        positions.append([x_coord+2, y_coord-1])
-                    if (y_coord + 1) < 8:
-                        positions.append([x_coord+2, y_coord+1])
-                # bottom positions
-                if (y_coord + 2) < 8:
-                    if (x_coord - 1) >= 0:
-                        positions.append([x_coord-1, y_coord+2])
-                    if (x_coord + 1) < 8:
-                        positions.append([x_coord+1, y_coord+2])
-
-            # calculate movs for king
-            elif piece_name[6:] == "king":
-                if (y_coord - 1) >= 0:
-                    # top spot
-                    positions.append([x_coord, y_coord-1])
-
-                if (y_coord + 1) < 8:
-                    # bottom spot
-                    positions.append([x_coord, y_coord+1])
-
-                if (x_coord - 1) >= 0:
-                    # left spot
-                    positions.append([x_coord-1, y_coord])
-                    # top left spot
-                    if (y_coord - 1) >= 0:
-                        positions.append([x_coord-1, y_coord-1])
-                    # bottom left spot
-                    if (y_coord + 1) < 8:
-                        positions.append([x_coord-1, y_coord+1])
-
-                if (x_coord + 1) < 8:
-                    # right spot
-                    positions.append([x_coord+1, y_coord])
-                    # top right spot
-                    if (y_coord - 1) >= 0:
-                        positions.append([x_coord+1, y_coord-1])
-                    # bottom right spot
-                    if (y_coord + 1) < 8:
-                        positions.append([x_coord+1, y_coord+1])
-
-            # calculate movs for queen
-            elif piece_name[6:] == "queen":
-                # find diagonal positions
-                positions = self.diagonal_moves(
-                    positions, piece_name, piece_coord)
-
-                # find linear moves
-                positions = self.linear_moves(
-                    positions, piece_name, piece_coord)
-
-            # list of positions to be removed
-            to_remove = []
-
-            # remove positions that overlap other pieces of the current player
-            for pos in positions:
-                x, y = pos
-
-                # convert list index to dictionary key
-                columnChar = chr(97 + x)
-                rowNo = 8 - y
-
-                # find the pieces to remove
-                des_piece_name = self.piece_location[columnChar][rowNo][0]
-                if (des_piece_name[:5] == piece_name[:5]):
-                    to_remove.append(pos)
-
-            # remove position from positions list
-            for i in to_remove:
-                positions.remove(i)
-        if not simulate and piece_name[6:] != "king":
-            legal_positions = []
-            for move in positions:
-                from_file = chr(97 + piece_coord[0])
-                from_rank = 8 - piece_coord[1]
-                backup = self._simulate_move(from_file, from_rank, move)
-                if not self.is_in_check(piece_name[:5]):
-                    legal_positions.append(move)
-                self._undo_simulation(from_file, from_rank, move, backup)
-            positions = legal_positions
-
-        # return list containing possible moves for the selected piece
-        return positions
+                piece_coord_x, piece_coord_y = coords(sq)
+                # draw piece on the board
+                self.chess_pieces.draw(self.screen, PIECE_NAMES[piece],
+                                       self.board_locations[piece_coord_x][piece_coord_y])
 
     def move_piece(self, turn):
         # get the coordinates of the square selected on the board
-        square = self.get_selected_square()
+        square_info = self.get_selected_square()
 
         # if a square was selected
-        if square:
+        if square_info:
             # get name of piece on the selected square
-            piece_name = square[0]
+            piece_name = square_info[0]
             # color of piece on the selected square
             piece_color = piece_name[:5]
             # board column character
-            columnChar = square[1]
+            columnChar = square_info[1]
             # board row number
-            rowNo = square[2]
+            rowNo = square_info[2]
 
             # get x, y coordinates
-            x, y = self.piece_location[columnChar][rowNo][2]
+            sq = ((rowNo - 1) << 3) | (ord(columnChar) - 97)
+            x, y = coords(sq)
+
+            # a selected king dropped on its own rook castles
+            if self.selected is not None and piece_color == turn and [x, y] in self.moves:
+                self.validate_move([x, y])
+                return
 
             # if there's a piece on the selected square
             if (len(piece_name) > 0) and (piece_color == turn):
@@ -435,24 +237,32 @@ class Chess(object):
                 self.moves = self.possible_moves(piece_name, [x, y])
 
             # checkmate mechanism
-            p = self.piece_location[columnChar][rowNo]
+            target = self.board.squares[sq]
 
             for i in self.moves:
                 if i == [x, y]:
-                    if (p[0][:5] == turn) or len(p[0]) == 0:
+                    if target == EMPTY or target & COLOR_MASK == COLOR_CODES[turn]:
                         self.validate_move([x, y])
                     else:
                         self.capture_piece(turn, [columnChar, rowNo], [x, y])
 
             # only the player with the turn gets to play
             if (piece_color == turn):
-                # change selection flag from all other pieces
-                for k in self.piece_location.keys():
-                    for key in self.piece_location[k].keys():
-                        self.piece_location[k][key][1] = False
-
                 # change selection flag of the selected piece
-                self.piece_location[columnChar][rowNo][1] = True
+                self.selected = sq
+
+    def play_move(self, move):
+        # play an encoded move, e.g. one chosen by the computer opponent
+        self.moves = []
+        self.selected = None
+        src = move_src(move)
+        # get the name of the source piece
+        src_name = PIECE_NAMES[self.board.squares[src]]
+        # move the source piece to the destination square and pass the turn
+        self.make_move(move)
+
+        print("{} moved from {} to {}".format(
+            src_name, square_name(src), square_name(move_des(move))))
 
     def get_selected_square(self):
         # get left event
@@ -463,300 +273,34 @@ class Chess(object):
             # get mouse event
             mouse_event = self.utils.get_mouse_event()
 
-            for i in range(len(self.board_locations)):
-                for j in range(len(self.board_locations)):
-                    rect = pygame.Rect(self.board_locations[i][j][0], self.board_locations[i][j][1],
-                                       self.square_length, self.square_length)
-                    collision = rect.collidepoint(
-                        mouse_event[0], mouse_event[1])
-                    if collision:
-                        selected = [rect.x, rect.y]
-                        # find x, y coordinates the selected square
-                        for k in range(len(self.board_locations)):
-                            #
-                            try:
-                                l = None
-                                l = self.board_locations[k].index(selected)
-                                if l != None:
-                                    # reset color of all selected pieces
-                                    for val in self.piece_location.values():
-                                        for value in val.values():
-                                            # [piece name, currently selected, board coordinates]
-                                            if not value[1]:
-                                                value[1] = False
-
-                                    # get column character and row number of the chess piece
-                                    columnChar = chr(97 + k)
-                                    rowNo = 8 - l
-                                    # get the name of the
-                                    piece_name = self.piece_location[columnChar][rowNo][0]
-
-                                    return [piece_name, columnChar, rowNo]
-                            except:
-                                pass
-        else:
-            return None
-
-    def capture_piece(self, turn, chess_board_coord, piece_coord):
-        # get x, y coordinate of the destination piece
-        x, y = piece_coord
-
-        # get chess board coordinate
-        columnChar, rowNo = chess_board_coord
-
-        p = self.piece_location[columnChar][rowNo]
+            # board square under the mouse, from the board's top left corner
+            origin_x, origin_y = self.board_locations[0][0]
+            x = (mouse_event[0] - origin_x) // self.square_length
+            y = (mouse_event[1] - origin_y) // self.square_length
+            if 0 <= x < 8 and 0 <= y < 8:
+                # get column character and row number of the chess piece
+                columnChar = chr(97 + x)
+                rowNo = 8 - y
+                # get the name of the piece on the square
+                piece_name = PIECE_NAMES[self.board.squares[square(x, y)]]
 
-        if p[0] == "white_king":
-            self.winner = "Black"
-            print("Black wins")
-        elif p[0] == "black_king":
-            self.winner = "White"
-            print("White wins")
+                return [piece_name, columnChar, rowNo]
+        return None
 
-        # add the captured piece to list
-        self.captured.append(p)
-        # move source piece to its destination
+    def capture_piece(self, turn, chess_board_coord, piece_coord):
+        # move source piece to its destination, the rules engine records
+        # the captured piece and ends the game if it was a king
         self.validate_move(piece_coord)
+        if self.winner:
+            print("{} wins".format(self.winner))
 
     def validate_move(self, destination):
-        desColChar = chr(97 + destination[0])
-        desRowNo = 8 - destination[1]
-
-        for k in self.piece_location.keys():
-            for key in self.piece_location[k].keys():
-                board_piece = self.piece_location[k][key]
-
-                if board_piece[1]:
-                    # unselect the source piece
-                    self.piece_location[k][key][1] = False
-                    # get the name of the source piece
-                    piece_name = self.piece_location[k][key][0]
-                    # move the source piece to the destination piece
-                    self.piece_location[desColChar][desRowNo][0] = piece_name
-
-                    src_name = self.piece_location[k][key][0]
-                    # remove source piece from its current position
-                    self.piece_location[k][key][0] = ""
-
-                    # change turn
-                    if (self.turn["black"]):
-                        self.turn["black"] = 0
-                        self.turn["white"] = 1
-                    elif ("white"):
-                        self.turn["black"] = 1
-                        self.turn["white"] = 0
-
-                    src_location = k + str(key)
-                    des_location = desColChar + str(desRowNo)
-                    print("{} moved from {} to {}".format(
-                        src_name,  src_location, des_location))
-
-    # helper function to find diagonal moves
-
-    def diagonal_moves(self, positions, piece_name, piece_coord):
-        # reset x and y coordinate values
-        x, y = piece_coord
-        # find top left diagonal spots
-        while (True):
-            x = x - 1
-            y = y - 1
-            if (x < 0 or y < 0):
-                break
-            else:
-                positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x and y coordinate values
-        x, y = piece_coord
-        # find bottom right diagonal spots
-        while (True):
-            x = x + 1
-            y = y + 1
-            if (x > 7 or y > 7):
-                break
-            else:
-                positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x and y coordinate values
-        x, y = piece_coord
-        # find bottom left diagonal spots
-        while (True):
-            x = x - 1
-            y = y + 1
-            if (x < 0 or y > 7):
-                break
-            else:
-                positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x and y coordinate values
-        x, y = piece_coord
-        # find top right diagonal spots
-        while (True):
-            x = x + 1
-            y = y - 1
-            if (x > 7 or y < 0):
-                break
-            else:
-                positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        return positions
-
-    # helper function to find horizontal and vertical moves
-
-    def linear_moves(self, positions, piece_name, piece_coord):
-        # reset x, y coordniate value
-        x, y = piece_coord
-        # horizontal moves to the left
-        while (x > 0):
-            x = x - 1
-            positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x, y coordniate value
-        x, y = piece_coord
-        # horizontal moves to the right
-        while (x < 7):
-            x = x + 1
-            positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x, y coordniate value
-        x, y = piece_coord
-        # vertical moves upwards
-        while (y > 0):
-            y = y - 1
-            positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        # reset x, y coordniate value
-        x, y = piece_coord
-        # vertical moves downwards
-        while (y < 7):
-            y = y + 1
-            positions.append([x, y])
-
-            # convert list index to dictionary key
-            columnChar = chr(97 + x)
-            rowNo = 8 - y
-            p = self.piece_location[columnChar][rowNo]
-
-            # stop finding possible moves if blocked by a piece
-            if len(p[0]) > 0 and piece_name[:5] != p[:5]:
-                break
-
-        return positions
-
-    def is_in_check(self, color):
-        king_pos = None
-        for file in self.piece_location:
-            for rank in self.piece_location[file]:
-                piece = self.piece_location[file][rank][0]
-                if piece == f"{color}_king":
-                    king_pos = self.piece_location[file][rank][2]
-                    break
-        if not king_pos:
-            return True  # king missing = game over
-
-        opponent = "white" if color == "black" else "black"
-        for file in self.piece_location:
-            for rank in self.piece_location[file]:
-                piece = self.piece_location[file][rank][0]
-                if piece.startswith(opponent):
-                    from_x, from_y = self.piece_location[file][rank][2]
-                    moves = self.possible_moves(
-                        piece, [from_x, from_y], simulate=True)
-                    if king_pos in moves:
-                        return True
-        return False
-
-    def has_legal_moves(self, color):
-        for file in self.piece_location:
-            for rank in self.piece_location[file]:
-                piece = self.piece_location[file][rank][0]
-                if piece.startswith(color):
-                    from_x, from_y = self.piece_location[file][rank][2]
-                    moves = self.possible_moves(piece, [from_x, from_y])
-                    for move in moves:
-                        backup = self._simulate_move(file, rank, move)
-                        if not self.is_in_check(color):
-                            self._undo_simulation(file, rank, move, backup)
-                            return True
-                        self._undo_simulation(file, rank, move, backup)
-        return False
-
-    def _simulate_move(self, file, rank, move):
-        des_col = chr(97 + move[0])
-        des_row = 8 - move[1]
-        piece = self.piece_location[file][rank][0]
-        captured = self.piece_location[des_col][des_row][0]
-
-        self.piece_location[des_col][des_row][0] = piece
-        self.piece_location[file][rank][0] = ""
-        return captured
-
-    def _undo_simulation(self, file, rank, move, captured_piece):
-        des_col = chr(97 + move[0])
-        des_row = 8 - move[1]
-        piece = self.piece_location[des_col][des_row][0]
-
-        self.piece_location[file][rank][0] = piece
-        self.piece_location[des_col][des_row][0] = captured_piece
+        if self.selected is None:
+            return
+
+        # pawns reaching the last rank become queens
+        move = self.find_move(self.selected, square(*destination))
+        # unselect the source piece
+        self.selected = None
+        if move is not None:
+            self.play_move(move)
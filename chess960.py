@@ -0,0 +1,110 @@
+"""Chess960 (Fischer Random) starting positions.
+
+Positions are numbered 0..959 with Scharnagl's scheme, in which 518 is the
+standard chess setup. All 960 back ranks are built once at import time.
+"""
+
+import random
+
+# letters used to write a back rank, e.g. "RNBQKBNR"
+PIECE_LETTERS = {
+    "king":   "K",
+    "queen":  "Q",
+    "rook":   "R",
+    "bishop": "B",
+    "knight": "N"
+}
+LETTER_PIECES = {letter: piece for piece, letter in PIECE_LETTERS.items()}
+
+
+# knight placements on the five squares left after bishops and queen
+_KNIGHTS = [(0, 1), (0, 2), (0, 3), (0, 4), (1, 2),
+            (1, 3), (1, 4), (2, 3), (2, 4), (3, 4)]
+
+
+def _decode(position_id):
+    back_rank = [None] * 8
+    n, light = divmod(position_id, 4)
+    n, dark = divmod(n, 4)
+    n, queen = divmod(n, 6)
+
+    # 1. bishops on opposite-colored squares (b, d, f, h and a, c, e, g)
+    back_rank[2 * light + 1] = "bishop"
+    back_rank[2 * dark] = "bishop"
+
+    # 2. queen on one of the six remaining squares
+    remaining = [i for i in range(8) if back_rank[i] is None]
+    back_rank[remaining[queen]] = "queen"
+
+    # 3. knights on two of the five remaining squares
+    remaining = [i for i in range(8) if back_rank[i] is None]
+    knight1, knight2 = _KNIGHTS[n]
+    back_rank[remaining[knight1]] = "knight"
+    back_rank[remaining[knight2]] = "knight"
+
+    # 4. rook, king, rook on the last three squares
+    rook1, king, rook2 = [i for i in range(8) if back_rank[i] is None]
+    back_rank[rook1] = "rook"
+    back_rank[king] = "king"
+    back_rank[rook2] = "rook"
+    return tuple(back_rank)
+
+
+# all start positions by Scharnagl number
+POSITIONS = tuple(_decode(position_id) for position_id in range(960))
+# back rank -> Scharnagl number
+_INDEX = {back_rank: position_id for position_id, back_rank in enumerate(POSITIONS)}
+
+# number of the standard chess starting position
+STANDARD = 518
+
+
+def decode(position_id):
+    """Back rank piece names from a to h of a Scharnagl position number"""
+    if not 0 <= position_id < 960:
+        raise ValueError("invalid Chess960 position number: {}".format(position_id))
+    return list(POSITIONS[position_id])
+
+
+def encode(back_rank):
+    """Scharnagl position number of a back rank"""
+    try:
+        return _INDEX[tuple(back_rank)]
+    except KeyError:
+        raise ValueError("invalid back rank: {}".format(back_rank))
+
+
+def random_position_id(rng=random):
+    return rng.randrange(960)
+
+
+def random_back_rank(rng=random):
+    """Back rank piece names from a to h for a random Chess960 position"""
+    return decode(random_position_id(rng))
+
+
+def is_valid_back_rank(back_rank):
+    # bishops on opposite colors and the king between the rooks
+    return tuple(back_rank) in _INDEX
+
+
+def parse_back_rank(text):
+    """Back rank piece names from a string such as "RNBQKBNR" """
+    try:
+        back_rank = [LETTER_PIECES[letter] for letter in text.upper()]
+    except KeyError:
+        raise ValueError("invalid back rank: {}".format(text))
+    if len(back_rank) != 8 or not is_valid_back_rank(back_rank):
+        raise ValueError("invalid back rank: {}".format(text))
+    return back_rank
+
+
+def back_rank_to_string(back_rank):
+    return "".join(PIECE_LETTERS[piece] for piece in back_rank)
+
+
+def parse_position(text):
+    """Back rank from a Scharnagl number ("518") or a string ("RNBQKBNR")"""
+    if text.isdigit():
+        return decode(int(text))
+    return parse_back_rank(text)
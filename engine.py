@@ -0,0 +1,151 @@
+"""Computer opponent running in a background process.
+
+EngineWorker owns a worker process with its own Search and transposition
+table, so thinking never holds the GIL of the process drawing the window.
+Requests go down one queue and progress comes back up another:
+
+    engine = EngineWorker()
+    engine.go(chess.start_fen, chess.move_list, time_limit=1.0)
+    ...                       # once per frame
+    move = engine.poll()      # the best move once the search is done
+    engine.depth, engine.score, engine.pv   # progress of the current search
+
+A position is sent as the game's start FEN and the moves played since, so
+the search knows which positions the game has already seen and steers
+clear of repeating them. Every request has an id. Starting a new search or calling stop() cancels
+the ones before it: the worker's search polls the id below which requests
+are cancelled, and answers to cancelled requests are dropped. With
+ponder=True the worker goes on thinking about the position after the
+expected reply once it has answered, which fills its table for the next
+move until the next request arrives.
+"""
+
+import multiprocessing
+import queue
+
+from fen import parse_fen
+from search import Search, MAX_PLY, MATE, MATE_BOUND, pv_string
+
+# message kinds sent back by the worker
+INFO = "info"
+BESTMOVE = "bestmove"
+
+
+def _worker(requests, responses, cancel_below, tt_size_mb):
+    engine = Search(tt_size_mb)
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, fen, moves, time_limit, depth, nodes, ponder = request
+        if request_id < cancel_below.value:
+            continue
+        engine.abort = lambda: request_id < cancel_below.value
+
+        def info(depth, score, nodes, pv):
+            responses.put((INFO, request_id, depth, score, nodes, pv))
+
+        # replay the game, remembering the positions it went through
+        board = parse_fen(fen)
+        played = []
+        for move in moves:
+            played.append(board.hash)
+            board.make_move(move)
+        move = engine.search(board, time_limit, depth, nodes, info, played)
+        if request_id < cancel_below.value:
+            continue
+        pv = engine.pv if engine.pv and engine.pv[0] == move else [move]
+        responses.put((BESTMOVE, request_id, move, pv))
+
+        # think on the opponent's time about the reply we expect
+        if ponder and len(pv) > 1:
+            for move in pv[:2]:
+                played.append(board.hash)
+                board.make_move(move)
+            engine.search(board, depth=MAX_PLY - 1, played=played)
+
+
+class EngineWorker(object):
+    def __init__(self, tt_size_mb=16):
+        # spawn rather than fork: the parent may hold SDL and display state
+        context = multiprocessing.get_context("spawn")
+        self.requests = context.Queue()
+        self.responses = context.Queue()
+        # requests with a lower id are cancelled
+        self.cancel_below = context.RawValue("l", 0)
+        self.process = context.Process(
+            target=_worker, args=(self.requests, self.responses, self.cancel_below, tt_size_mb),
+            daemon=True)
+        self.process.start()
+        # id of the last request, and whether it is still being searched
+        self.request_id = 0
+        self.thinking = False
+        self._reset_progress()
+
+    def _reset_progress(self):
+        # progress of the current search, from the last completed iteration
+        self.depth = 0
+        self.score = 0
+        self.nodes = 0
+        self.pv = []
+
+    def go(self, fen, moves=(), time_limit=None, depth=None, nodes=None, ponder=False):
+        """Start searching a position, cancelling any earlier request
+
+        The position is a start FEN and the encoded moves played from it.
+        The limits are those of Search.search. Returns the request id.
+        """
+        self.request_id += 1
+        self.cancel_below.value = self.request_id
+        self.requests.put((self.request_id, fen, list(moves), time_limit, depth, nodes, ponder))
+        self.thinking = True
+        self._reset_progress()
+        return self.request_id
+
+    def stop(self):
+        """Cancel the current search, and any pondering"""
+        self.cancel_below.value = self.request_id + 1
+        self.thinking = False
+
+    def poll(self):
+        """Read the worker's messages without blocking
+
+        Updates the progress attributes and returns the best move once the
+        current search has finished, otherwise None.
+        """
+        best = None
+        while True:
+            try:
+                message = self.responses.get_nowait()
+            except queue.Empty:
+                break
+            if message[1] != self.request_id or not self.thinking:
+                # answer to a cancelled or already answered request
+                continue
+            if message[0] == INFO:
+                self.depth, self.score, self.nodes, self.pv = message[2:]
+            else:
+                best = message[2]
+                self.pv = message[3]
+                self.thinking = False
+        return best
+
+    def progress(self, moves=4):
+        """One line describing the current search, "" before the first depth"""
+        if not self.thinking or not self.depth:
+            return ""
+        if abs(self.score) >= MATE_BOUND:
+            # plies to mate, as moves, signed from the engine's side
+            mate = (MATE - abs(self.score) + 1) // 2
+            score = "#{}".format(mate if self.score > 0 else -mate)
+        else:
+            score = "{:+.2f}".format(self.score / 100.0)
+        return "depth {}  {}  {}".format(self.depth, score, pv_string(self.pv[:moves]))
+
+    def close(self):
+        """Stop the worker process"""
+        self.stop()
+        self.requests.put(None)
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
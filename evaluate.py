@@ -0,0 +1,150 @@
+"""Static position evaluation.
+
+Material plus piece-square tables. evaluate() scores one board in pure
+python; evaluate_batch() scores many at once with NumPy by stacking them
+into N x 12 x 64 piece planes and contracting with a 12 x 64 weight tensor.
+NumPy is only imported when batch scoring is used.
+"""
+
+from board import WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, EMPTY
+
+# material value of each piece type in centipawns
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0, 0]
+
+# piece-square tables from white's side, written as seen from white with
+# rank 8 on top
+_PST = {
+    PAWN: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        50,  50,  50,  50,  50,  50,  50,  50,
+        10,  10,  20,  30,  30,  20,  10,  10,
+        5,   5,  10,  25,  25,  10,   5,   5,
+        0,   0,   0,  20,  20,   0,   0,   0,
+        5,  -5, -10,   0,   0, -10,  -5,   5,
+        5,  10,  10, -20, -20,  10,  10,   5,
+        0,   0,   0,   0,   0,   0,   0,   0],
+    KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50],
+    BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20],
+    ROOK: [
+        0,   0,   0,   0,   0,   0,   0,   0,
+        5,  10,  10,  10,  10,  10,  10,   5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        -5,   0,   0,   0,   0,   0,   0,  -5,
+        0,   0,   0,   5,   5,   0,   0,   0],
+    QUEEN: [
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+        -5,   0,   5,   5,   5,   5,   0,  -5,
+        0,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20],
+    KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20,  20,   0,   0,   0,   0,  20,  20,
+        20,  30,  10,   0,   0,  10,  30,  20],
+}
+
+# plane order for batch scoring: white pawn .. king, black pawn .. king
+PLANE_PIECES = [color | piece_type for color in (WHITE, BLACK)
+                for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)]
+
+
+def _weights():
+    # WEIGHTS[piece code][square]: material plus table value, positive for
+    # white pieces and negative for black ones
+    weights = [[0] * 64 for piece in range(16)]
+    for piece_type, table in _PST.items():
+        for sq in range(64):
+            # tables are written rank 8 first, squares count from a1
+            value = PIECE_VALUES[piece_type] + table[(7 - (sq >> 3)) * 8 + (sq & 7)]
+            weights[WHITE | piece_type][sq] = value
+            # black uses the same table mirrored vertically
+            weights[BLACK | piece_type][sq ^ 56] = -value
+    return tuple(tuple(row) for row in weights)
+
+
+WEIGHTS = _weights()
+
+
+def evaluate(board):
+    """Score in centipawns from the point of view of the side to move"""
+    score = 0
+    for sq, piece in enumerate(board.squares):
+        if piece != EMPTY:
+            score += WEIGHTS[piece][sq]
+    return score if board.side == WHITE else -score
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("batch evaluation requires numpy (pip install numpy)")
+    return numpy
+
+
+def weight_tensor():
+    """12 x 64 float32 array of the evaluation weights, one row per plane"""
+    np = _numpy()
+    return np.array([WEIGHTS[piece] for piece in PLANE_PIECES], dtype=np.float32)
+
+
+def planes(boards):
+    """Stack boards into an N x 12 x 64 uint8 array of piece planes"""
+    np = _numpy()
+    bitboards = np.array([[board.bitboards[piece] for piece in PLANE_PIECES]
+                          for board in boards], dtype=np.uint64).reshape(-1, 12)
+    # square n is bit n of each little-endian 64-bit bitboard
+    as_bytes = bitboards.astype("<u8").view(np.uint8).reshape(-1, 12, 8)
+    return np.unpackbits(as_bytes, axis=2, bitorder="little")
+
+
+def score_planes(piece_planes, sides=None, weights=None):
+    """Score N x 12 x 64 piece planes at once
+
+    Returns a float32 array of white-relative scores, or scores from the
+    side to move when `sides` (an array of WHITE / BLACK codes) is given.
+    """
+    np = _numpy()
+    if weights is None:
+        weights = weight_tensor()
+    piece_planes = np.asarray(piece_planes)
+    scores = (piece_planes.reshape(len(piece_planes), -1).astype(np.float32)
+              @ np.asarray(weights, dtype=np.float32).reshape(-1))
+    if sides is not None:
+        scores = np.where(np.asarray(sides) == WHITE, scores, -scores)
+    return scores
+
+
+def evaluate_batch(boards, weights=None):
+    """Scores of many boards from each side to move, as a NumPy array"""
+    np = _numpy()
+    boards = list(boards)
+    sides = np.array([board.side for board in boards])
+    return score_planes(planes(boards), sides, weights)
@@ -0,0 +1,279 @@
+"""FEN import and export.
+
+Reads and writes Forsyth-Edwards Notation, including the two Chess960
+extensions of the castling field:
+
+    X-FEN          KQkq when the castling rook is the outermost rook on its
+                   side of the king, the rook's file letter otherwise
+    Shredder-FEN   always the rook's file letter, e.g. HAha
+
+Both are accepted on input. read_fens() streams boards from a FEN or EPD
+file one line at a time, so files with millions of positions never have
+to fit in memory.
+
+    board = parse_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    text = to_fen(board, shredder=True)
+"""
+
+from board import (Board, EMPTY, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                   COLOR_MASK, TYPE_MASK, WHITE_KINGSIDE, WHITE_QUEENSIDE,
+                   BLACK_KINGSIDE, BLACK_QUEENSIDE, square_name)
+from zobrist import PIECE_KEYS
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# FEN letter -> piece code, and back
+FEN_PIECES = {
+    "P": WHITE | PAWN, "N": WHITE | KNIGHT, "B": WHITE | BISHOP,
+    "R": WHITE | ROOK, "Q": WHITE | QUEEN, "K": WHITE | KING,
+    "p": BLACK | PAWN, "n": BLACK | KNIGHT, "b": BLACK | BISHOP,
+    "r": BLACK | ROOK, "q": BLACK | QUEEN, "k": BLACK | KING,
+}
+FEN_LETTERS = [""] * 16
+for _letter, _piece in FEN_PIECES.items():
+    FEN_LETTERS[_piece] = _letter
+
+_FILES = "abcdefgh"
+
+# parsed ranks, keyed by (rank, text); corpora repeat the same few hundred
+# rank strings ("pppppppp", "8", "2P5", ...) over and over
+_RANK_CACHE = {}
+_RANK_CACHE_SIZE = 1 << 16
+
+
+def _parse_rank(rank, text):
+    """Decode and cache one rank of the placement field, rank 0 being rank 1
+
+    Returns (piece codes of its 8 squares, (piece code, bits) pairs to OR
+    into the bitboards, hash of its pieces, (color, square) of its kings).
+    """
+    codes = []
+    for c in text:
+        if c in "12345678":
+            codes.extend([EMPTY] * (ord(c) - 48))
+        elif c in FEN_PIECES:
+            codes.append(FEN_PIECES[c])
+        else:
+            raise ValueError("invalid FEN: bad piece letter {!r}".format(c))
+        if len(codes) > 8:
+            break
+    if len(codes) != 8:
+        raise ValueError("invalid FEN: rank {!r} is not 8 squares wide".format(text))
+
+    bits = {}
+    h = 0
+    kings = []
+    for file, piece in enumerate(codes):
+        if piece != EMPTY:
+            sq = (rank << 3) | file
+            bits[piece] = bits.get(piece, 0) | 1 << sq
+            bits[piece & COLOR_MASK] = bits.get(piece & COLOR_MASK, 0) | 1 << sq
+            h ^= PIECE_KEYS[piece][sq]
+            if piece & TYPE_MASK == KING:
+                kings.append((piece & COLOR_MASK, sq))
+    parsed = (tuple(codes), tuple(bits.items()), h, tuple(kings))
+    if len(_RANK_CACHE) >= _RANK_CACHE_SIZE:
+        _RANK_CACHE.clear()
+    _RANK_CACHE[rank, text] = parsed
+    return parsed
+
+
+def _castling_rook(board, color, letter):
+    # (right, rook square) for one letter of the castling field
+    king = board.kings[color]
+    back = 0 if color == WHITE else 56
+    if king is None or king & 56 != back:
+        raise ValueError("invalid FEN: castling right {!r} without a king on its "
+                         "back rank".format(letter))
+    rook = color | ROOK
+    squares = board.squares
+    lower = letter.lower()
+    if lower == "k":
+        # outermost rook on the h side of the king
+        files = [f for f in range(7, king & 7, -1) if squares[back + f] == rook]
+    elif lower == "q":
+        # outermost rook on the a side of the king
+        files = [f for f in range(king & 7) if squares[back + f] == rook]
+    elif lower in _FILES:
+        files = [_FILES.index(lower)]
+        if squares[back + files[0]] != rook or files[0] == king & 7:
+            files = []
+    else:
+        raise ValueError("invalid FEN: bad castling letter {!r}".format(letter))
+    if not files:
+        raise ValueError("invalid FEN: no rook for castling right {!r}".format(letter))
+    file = files[0]
+    if file > king & 7:
+        right = WHITE_KINGSIDE if color == WHITE else BLACK_KINGSIDE
+    else:
+        right = WHITE_QUEENSIDE if color == WHITE else BLACK_QUEENSIDE
+    return right, back + file
+
+
+def parse_fen(text, board=None):
+    """Board for a FEN, X-FEN or Shredder-FEN string
+
+    The halfmove clock and move number may be left out, as in EPD, whose
+    operations after the fourth field are ignored. If `board` is given it
+    is cleared and filled in place instead of allocating a new one. Raises
+    ValueError on malformed input.
+    """
+    fields = text.split(";", 1)[0].split()
+    if len(fields) < 4:
+        raise ValueError("invalid FEN: expected at least 4 fields in {!r}".format(text))
+    ranks = fields[0].split("/")
+    if len(ranks) != 8:
+        raise ValueError("invalid FEN: expected 8 ranks in {!r}".format(fields[0]))
+    if board is None:
+        board = Board()
+    else:
+        board.clear()
+
+    # === Piece placement, rank 8 first ===
+    squares = board.squares
+    bitboards = board.bitboards
+    kings = board.kings
+    h = 0
+    cache = _RANK_CACHE
+    rank = 8
+    for rank_text in ranks:
+        rank -= 1
+        parsed = cache.get((rank, rank_text))
+        if parsed is None:
+            parsed = _parse_rank(rank, rank_text)
+        codes, bits, rank_hash, rank_kings = parsed
+        squares[rank << 3:(rank << 3) + 8] = codes
+        for piece, b in bits:
+            bitboards[piece] |= b
+        h ^= rank_hash
+        for color, sq in rank_kings:
+            kings[color] = sq
+    board.hash = h
+
+    # === Side to move ===
+    if fields[1] == "w":
+        pass
+    elif fields[1] == "b":
+        board.set_side(BLACK)
+    else:
+        raise ValueError("invalid FEN: bad side to move {!r}".format(fields[1]))
+
+    # === Castling rights ===
+    if fields[2] != "-":
+        rights = 0
+        rooks = {}
+        for letter in fields[2]:
+            right, rook = _castling_rook(board, WHITE if letter.isupper() else BLACK, letter)
+            rights |= right
+            rooks[right] = rook
+        board.set_castling(rights, rooks)
+
+    # === En passant ===
+    ep = fields[3]
+    if ep != "-":
+        if (len(ep) != 2 or ep[0] not in _FILES
+                or ep[1] != ("6" if board.side == WHITE else "3")):
+            raise ValueError("invalid FEN: bad en passant square {!r}".format(ep))
+        sq = _FILES.index(ep[0]) + (40 if board.side == WHITE else 16)
+        # like make_move, only keep the square if a pawn can take there
+        pawn = board.side | PAWN
+        pushed = sq - 8 if board.side == WHITE else sq + 8
+        file = sq & 7
+        if squares[pushed] == pawn ^ COLOR_MASK and (
+                (file > 0 and squares[pushed - 1] == pawn)
+                or (file < 7 and squares[pushed + 1] == pawn)):
+            board.set_ep(sq)
+
+    # === Move counters, absent from EPD lines ===
+    if len(fields) > 5 and fields[4].isdigit() and fields[5].isdigit():
+        board.halfmove = int(fields[4])
+        board.fullmove = max(1, int(fields[5]))
+    return board
+
+
+def _castling_field(board, shredder):
+    letters = []
+    for right in (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE):
+        if not board.castling & right:
+            continue
+        rook = board.castle_rooks[right]
+        color = WHITE if right in (WHITE_KINGSIDE, WHITE_QUEENSIDE) else BLACK
+        kingside = right in (WHITE_KINGSIDE, BLACK_KINGSIDE)
+        letter = _FILES[rook & 7]
+        if not shredder:
+            # X-FEN only names the file when an outer rook is in the way
+            back = rook & 56
+            outer = range((rook & 7) + 1, 8) if kingside else range(rook & 7)
+            if all(board.squares[back + f] != color | ROOK for f in outer):
+                letter = "k" if kingside else "q"
+        letters.append(letter.upper() if color == WHITE else letter)
+    return "".join(letters) or "-"
+
+
+def to_fen(board, shredder=False):
+    """FEN string of a board
+
+    Castling rights are written in X-FEN, which is plain FEN for standard
+    chess positions, or in Shredder-FEN if `shredder` is set.
+    """
+    squares = board.squares
+    ranks = []
+    for base in range(56, -8, -8):
+        rank = ""
+        empty = 0
+        for sq in range(base, base + 8):
+            piece = squares[sq]
+            if piece == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += FEN_LETTERS[piece]
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+    return "{} {} {} {} {} {}".format(
+        "/".join(ranks),
+        "w" if board.side == WHITE else "b",
+        _castling_field(board, shredder),
+        "-" if board.ep is None else square_name(board.ep),
+        board.halfmove,
+        board.fullmove)
+
+
+def read_fens(source, reuse=False):
+    """Generate a board for every position in a FEN or EPD file
+
+    `source` is a file name or an iterable of lines. Blank lines and lines
+    starting with "#" are skipped. With `reuse` set the same board object
+    is refilled for every line, which is faster when each position is only
+    looked at before moving on to the next one.
+    """
+    if isinstance(source, str):
+        with open(source) as lines:
+            for board in read_fens(lines, reuse):
+                yield board
+        return
+    board = Board() if reuse else None
+    for number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+        try:
+            yield parse_fen(line, board)
+        except ValueError as e:
+            raise ValueError("line {}: {}".format(number, e))
+
+
+def epd_operations(text):
+    """Operations after the position of an EPD line, as an {opcode: operand} dict
+
+    "... ;D1 20 ;D2 400" gives {"D1": "20", "D2": "400"}.
+    """
+    operations = {}
+    for operation in text.split(";")[1:]:
+        parts = operation.split(None, 1)
+        if parts:
+            operations[parts[0]] = parts[1].strip() if len(parts) > 1 else ""
+    return operations
@@ -1,22 +1,79 @@
 import os
+import time
 import pygame
 from pygame.locals import *
 from piece import Piece
 from chess import Chess
 from utils import Utils
+from engine import EngineWorker
+from renderer import Renderer
+from resources import ResourceCache
+from server import ServerClient, WINNERS
+from movegen import move_name
+
+# frames per second while the screen is changing on its own
+FRAME_RATE = 60
+
+# events posted when the game server replies, and every second to redraw
+# the clocks of a server game
+SERVER_EVENT = USEREVENT + 1
+CLOCK_EVENT = USEREVENT + 2
+
+# the screen is designed at 640x750: a 50 pixel bar, the 640 pixel board
+# and room for the resign buttons. Other window sizes scale this layout.
+DESIGN_WIDTH = 640
+DESIGN_HEIGHT = 750
+BAR_HEIGHT = 50
+
+# labels that never change, rendered once at start up
+STATIC_LABELS = [
+    ("Freestyle Chess", 50, (0, 0, 0), False),
+    ("Created by Neonative", 20, (0, 0, 0)),
+    ("Play", 20, (255, 255, 255)),
+    ("Play Again", 20, (255, 255, 255)),
+    ("Resign White", 20, (255, 255, 255)),
+    ("Resign Black", 20, (255, 255, 255)),
+    ("Turn: White", 20, (255, 255, 255)),
+    ("Turn: Black", 20, (255, 255, 255))
+]
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, ai_color=None, think_time=1.0, pgn_file="games.pgn",
+                 size=(DESIGN_WIDTH, DESIGN_HEIGHT), server=None, game_id=None,
+                 color="white", clock=None):
         # screen dimensions
-        screen_width = 640
-        screen_height = 750
+        screen_width, screen_height = size
         # flag to know if game menu has been showed
         self.menu_showed = False
         # flag to set game loop
         self.running = True
         # base folder for program resources
         self.resources = "res"
+        # color played by the computer ("white", "black" or None)
+        self.ai_color = ai_color
+        # seconds the computer may think per move
+        self.think_time = think_time
+        # alpha-beta engine for the computer opponent, thinking in its own
+        # process, and the hash of the position it was asked about
+        self.engine = EngineWorker() if ai_color else None
+        self.engine_position = None
+        # file games are appended to as PGN
+        self.pgn_file = pgn_file
+        # game server to play on as a thin client, as (host, port); the
+        # server validates the moves, runs the clocks and ends the game
+        self.server = server
+        self.client = None
+        # game id on the server (None starts a new game), the seat asked
+        # for and the one taken, and [seconds, increment] for new games
+        self.remote_game = game_id
+        self.seat_color = color
+        self.seat = None
+        self.remote_clock = clock
+        # server ply the board is at, and the last state received and when
+        self.remote_ply = None
+        self.remote_state = None
+        self.state_received = 0.0
 
         # initialize game window
         pygame.display.init()
@@ -24,7 +81,7 @@ class Game:
         pygame.font.init()
 
         # create game window
-        self.screen = pygame.display.set_mode([screen_width, screen_height])
+        self.screen = pygame.display.set_mode([screen_width, screen_height], RESIZABLE)
 
         # title of window
         window_title = "FreeStyle Chess"
@@ -39,227 +96,512 @@ class Game:
         pygame.display.set_icon(icon)
         # update display
         pygame.display.flip()
+        # mouse clicks of the current frame
+        self.utils = Utils()
+        # fonts, labels and overlays shared by everything drawn
+        self.cache = ResourceCache()
+        self.cache.preload(STATIC_LABELS)
         # set game clock
         self.clock = pygame.time.Clock()
+        # screen currently shown ("menu", "game" or "winner"), and the
+        # rects painted this frame
+        self.view = None
+        self.dirty = []
+        # window size to lay the screen out for on the next frame
+        self.new_size = None
+        # scale of the design layout, and where its top left corner is
+        self.scale = 1.0
+        self.origin = (0, 0)
 
     def start_game(self):
         """Function containing main game loop"""
         # chess board offset
         self.board_offset_x = 0
-        self.board_offset_y = 50
+        self.board_offset_y = BAR_HEIGHT
         self.board_dimensions = (self.board_offset_x, self.board_offset_y)
 
         # get location of chess board image
         board_src = os.path.join(self.resources, "board.png")
-        # load the chess board image
+        # load the chess board image, at the size of the design layout
         self.board_img = pygame.image.load(board_src).convert()
 
         # get the width of a chess board square
         square_length = self.board_img.get_rect().width // 8
 
-        # initialize list that stores all places to put chess pieces on the board
-        self.board_locations = []
-
-        # calculate coordinates of the each square on the board
-        for x in range(0, 8):
-            self.board_locations.append([])
-            for y in range(0, 8):
-                self.board_locations[x].append([self.board_offset_x+(x*square_length),
-                                                self.board_offset_y+(y*square_length)])
+        # initialize list that stores all places to put chess pieces on the
+        # board, filled in by layout()
+        self.board_locations = [[[0, 0] for y in range(8)] for x in range(8)]
 
         # get location of image containing the chess pieces
         pieces_src = os.path.join(self.resources, "pieces.png")
         # create class object that handles the gameplay logic
         self.chess = Chess(self.screen, pieces_src,
-                           self.board_locations, square_length)
+                           self.board_locations, square_length, self.cache)
+        # repaints only the squares that changed
+        self.renderer = Renderer(self.screen, self.board_img, self.board_dimensions,
+                                 self.chess.chess_pieces, self.cache)
+        # fit everything to the window
+        self.layout(self.screen.get_size())
+        if self.server is not None:
+            self.connect()
+
+        # clicks reach the board through the shared input helper
+        self.chess.utils = self.utils
 
         # game loop
         while self.running:
-            self.clock.tick(5)
-            # poll events
-            for event in pygame.event.get():
-                # get keys pressed
-                key_pressed = pygame.key.get_pressed()
-                # check if the game has been closed by the user
-                if event.type == pygame.QUIT or key_pressed[K_ESCAPE]:
-                    # set flag to break out of the game loop
-                    self.running = False
-                elif key_pressed[K_SPACE]:
-                    self.chess.reset()
-
-            winner = self.chess.winner
-
-            if self.menu_showed == False:
-                self.menu()
-            elif len(winner) > 0:
-                self.declare_winner(winner)
+            if self.busy():
+                # keep rendering at the display refresh rate
+                self.clock.tick(FRAME_RATE)
+                events = pygame.event.get()
             else:
-                self.game()
+                # nothing changes on screen until the next event
+                events = [pygame.event.wait()] + pygame.event.get()
 
-            # for testing mechanics of the game
-            # self.game()
-            # self.declare_winner(winner)
-
-            # update display
-            pygame.display.flip()
-            # update events
-            pygame.event.pump()
+            for event in events:
+                self.handle_event(event)
+                if not self.running:
+                    break
+            else:
+                self.frame()
 
+        if self.engine is not None:
+            self.engine.close()
+        if self.client is not None:
+            self.client.close()
         # call method to stop pygame
         pygame.quit()
 
-    def menu(self):
+    def player_turn(self):
+        """True if the side to move is played with the mouse in this window"""
+        color = "white" if self.chess.turn["white"] else "black"
+        if color == self.ai_color:
+            return False
+        if self.client is not None:
+            return color == self.seat
+        return True
+
+    def busy(self):
+        """True while the screen changes without user input"""
+        # the computer is about to move
+        return (self.view == "game" and self.ai_color is not None
+                and bool(self.chess.turn[self.ai_color]) and not self.chess.winner)
+
+    def handle_event(self, event):
+        # check if the game has been closed by the user
+        if event.type == pygame.QUIT:
+            # set flag to break out of the game loop
+            self.running = False
+        elif event.type == MOUSEBUTTONDOWN and event.button == 1:
+            # every click is played on its own frame, so none is lost
+            self.utils.click = event.pos
+            self.frame()
+            self.utils.click = None
+        elif event.type == SERVER_EVENT:
+            if self.client is not None:
+                self.receive()
+        elif event.type == KEYDOWN:
+            if event.key == K_ESCAPE:
+                self.running = False
+            elif event.key in (K_SPACE, K_LEFT, K_RIGHT) and self.client is not None:
+                # the server owns the game, it cannot be reset or taken back
+                pass
+            elif event.key == K_SPACE:
+                self.stop_thinking()
+                self.chess.reset()
+            elif event.key == K_RETURN and self.view == "menu":
+                self.menu_showed = True
+            elif event.key == K_RETURN and self.view == "winner":
+                self.menu_showed = False
+                self.stop_thinking()
+                self.chess.reset()
+                if self.client is not None:
+                    self.new_remote_game()
+            elif event.key == K_p:
+                self.save_pgn()
+            elif event.key == K_LEFT:
+                self.undo_move()
+            elif event.key == K_RIGHT:
+                self.redo_move()
+        elif event.type == VIDEORESIZE:
+            # lay out once for the last size of a burst of resize events
+            self.new_size = event.size
+        elif event.type in (VIDEOEXPOSE, WINDOWEXPOSED):
+            # the window was uncovered, paint it again in full
+            self.view = None
+
+    def layout(self, size):
+        """Fit the board, pieces and buttons to a window of the given size
+
+        The design layout is scaled uniformly and centred. The board image
+        and the pieces spritesheet are smoothscaled once per size through
+        the resource cache, which a new size empties.
+        """
+        width, height = size
+        self.cache.invalidate()
+        self.scale = min(width / DESIGN_WIDTH, height / DESIGN_HEIGHT)
+        design_width = round(DESIGN_WIDTH * self.scale)
+        self.origin = ((width - design_width) // 2,
+                       (height - round(DESIGN_HEIGHT * self.scale)) // 2)
+
+        # width of a chess board square at this scale
+        image_square = self.board_img.get_width() // 8
+        square_length = max(int(image_square * self.scale), 1)
+        board_side = square_length * 8
+        # chess board offset
+        self.board_offset_x = self.origin[0] + (design_width - board_side) // 2
+        self.board_offset_y = self.origin[1] + round(BAR_HEIGHT * self.scale)
+        self.board_dimensions = (self.board_offset_x, self.board_offset_y)
+
+        # calculate coordinates of the each square on the board, in place
+        # so the Chess object sees them
+        for x in range(0, 8):
+            for y in range(0, 8):
+                self.board_locations[x][y] = [self.board_offset_x + (x * square_length),
+                                              self.board_offset_y + (y * square_length)]
+
+        board = self.cache.scaled("board", self.board_img, (board_side, board_side))
+        self.chess.screen = self.screen
+        self.chess.square_length = square_length
+        self.chess.chess_pieces.resize(square_length / image_square, self.cache)
+        self.renderer.resize(self.screen, board, self.board_dimensions, self.scale)
+        self.cache.preload([(label[0], self.font_size(label[1])) + label[2:]
+                            for label in STATIC_LABELS])
+        # paint the whole window again
+        self.view = None
+
+    def rect(self, x, y, width, height):
+        # screen rect of a rect given in design layout coordinates
+        return pygame.Rect(self.origin[0] + round(x * self.scale),
+                           self.origin[1] + round(y * self.scale),
+                           round(width * self.scale), round(height * self.scale))
+
+    def font_size(self, size):
+        # font size of a design layout font size
+        return max(round(size * self.scale), 6)
+
+    def frame(self):
+        """Run and draw one frame of the current screen"""
+        if self.new_size is not None:
+            self.screen = pygame.display.set_mode(self.new_size, RESIZABLE)
+            self.layout(self.screen.get_size())
+            self.new_size = None
+
+        winner = self.chess.winner
+
+        if self.menu_showed == False:
+            view = "menu"
+        elif len(winner) > 0:
+            view = "winner"
+        else:
+            view = "game"
+        # a new screen is painted in full, after that only what changed
+        redraw = view != self.view
+        self.view = view
+        if redraw:
+            self.renderer.invalidate()
+            self.dirty.append(self.screen.get_rect())
+            if view != "game":
+                self.stop_thinking()
+
+        if view == "menu":
+            self.menu(redraw)
+        elif view == "winner":
+            self.declare_winner(winner, redraw)
+        else:
+            self.game(redraw)
+
+        # for testing mechanics of the game
+        # self.game()
+        # self.declare_winner(winner)
+
+        # update the parts of the display that were painted
+        if self.dirty:
+            pygame.display.update(self.dirty)
+            self.dirty = []
+
+    def think(self):
+        """Ask the engine about the current position, or collect its move
+
+        Returns the move once the engine has found it, otherwise None.
+        """
+        if self.engine_position != self.chess.hash:
+            self.engine_position = self.chess.hash
+            # the engine ponders on the player's time after answering
+            self.engine.go(self.chess.start_fen, self.chess.move_list,
+                           time_limit=self.think_time, ponder=True)
+        move = self.engine.poll()
+        if move:
+            self.engine_position = None
+        return move
+
+    def stop_thinking(self):
+        # cancel the engine's search when the game moves elsewhere
+        if self.engine is not None:
+            self.engine.stop()
+            self.engine_position = None
+
+    def connect(self):
+        """Connect to the game server and take a seat"""
+        host, port = self.server
+        self.client = ServerClient(
+            host, port, notify=lambda: pygame.event.post(pygame.event.Event(SERVER_EVENT)))
+        if self.remote_game is None:
+            self.client.send("new", color=self.seat_color, clock=self.remote_clock)
+        else:
+            self.client.send("join", game=self.remote_game, color=self.seat_color)
+        # redraw the clocks every second
+        pygame.time.set_timer(CLOCK_EVENT, 1000)
+
+    def new_remote_game(self):
+        # leave the finished server game and start another one
+        if self.remote_game is not None:
+            self.client.send("leave", game=self.remote_game)
+        self.remote_game = None
+        self.remote_ply = None
+        self.remote_state = None
+        self.client.send("new", color=self.seat_color, clock=self.remote_clock)
+
+    def receive(self):
+        """Apply the replies of the game server"""
+        for reply in self.client.poll():
+            if reply["event"] == "joined":
+                self.remote_game = reply["game"]
+                self.seat = reply["color"]
+                self.remote_ply = None
+                print("joined game {} on the server as {}".format(
+                    reply["game"], reply["color"] or "watcher"))
+            elif reply["event"] == "state" and reply["game"] == self.remote_game:
+                self.sync(reply)
+            elif reply["event"] == "error":
+                print("server: {}".format(reply["message"]))
+                # the board may be ahead of the server, ask where it is
+                if self.remote_game is not None:
+                    self.client.send("state", game=self.remote_game)
+            elif reply["event"] == "closed":
+                print("connection to the server closed")
+                pygame.time.set_timer(CLOCK_EVENT, 0)
+                self.client.close()
+                self.client = None
+                return
+
+    def sync(self, state):
+        """Bring the board to a game state sent by the server"""
+        if state["ply"] != self.remote_ply:
+            # play the opponent's move so the history carries on, and load
+            # the position when more than one move was missed
+            if (self.remote_ply is not None and state["ply"] == self.remote_ply + 1
+                    and state["last"]):
+                for move in self.chess.legal_moves():
+                    if move_name(move) == state["last"]:
+                        self.chess.play_move(move)
+                        break
+            self.remote_ply = state["ply"]
+        if self.chess.fen() != state["fen"]:
+            self.chess.load_fen(state["fen"])
+        if state["termination"] and WINNERS[state["result"]] != self.chess.winner:
+            print("game over: {} by {}".format(state["result"], state["termination"]))
+        self.chess.winner = WINNERS[state["result"]]
+        self.remote_state = state
+        self.state_received = time.time()
+
+    def send_move(self, move):
+        # a move played on this board, which the server validates
+        self.client.send("move", game=self.remote_game, move=move_name(move))
+        if self.remote_ply is not None:
+            self.remote_ply += 1
+
+    def clock_text(self):
+        # the server game and its clocks, counting down the running one
+        state = self.remote_state
+        if self.client is None or state is None:
+            return ""
+        text = "game {}".format(state["game"])
+        if state["clock"] is not None:
+            clocks = dict(state["clock"])
+            if state["running"]:
+                clocks[state["running"]] -= time.time() - self.state_received
+            text += "  White {}  Black {}".format(
+                *("{}:{:02d}".format(int(max(left, 0)) // 60, int(max(left, 0)) % 60)
+                  for left in (clocks["white"], clocks["black"])))
+        return text
+
+    def undo_move(self):
+        """Take back the last move, and the computer's reply before it"""
+        self.stop_thinking()
+        if self.chess.undo() and self.ai_color and self.chess.turn[self.ai_color]:
+            self.chess.undo()
+
+    def redo_move(self):
+        """Replay a move taken back, and the computer's reply after it"""
+        self.stop_thinking()
+        if self.chess.redo() and self.ai_color and self.chess.turn[self.ai_color]:
+            self.chess.redo()
+
+    def save_pgn(self):
+        """Append the current game to the PGN file"""
+        players = {color: "Computer" if color == self.ai_color else "Human"
+                   for color in ("white", "black")}
+        if self.seat is not None:
+            players = {color: "Human" if color == self.seat else "Remote"
+                       for color in ("white", "black")}
+        text = self.chess.pgn({"Event": "Freestyle Chess", "Date": time.strftime("%Y.%m.%d"),
+                               "White": players["white"], "Black": players["black"]})
+        with open(self.pgn_file, "a") as f:
+            f.write(text + "\n")
+        print("game saved to {}".format(self.pgn_file))
+
+    def menu(self, redraw=True):
         """method to show game menu"""
-        # background color
-        bg_color = (255, 255, 255)
-        # set background color
-        self.screen.fill(bg_color)
         # black color
         black_color = (0, 0, 0)
-        # coordinates for "Play" button
-        start_btn = pygame.Rect(270, 300, 100, 50)
-        # show play button
-        pygame.draw.rect(self.screen, black_color, start_btn)
-
         # white color
         white_color = (255, 255, 255)
-        # create fonts for texts
-        big_font = pygame.font.SysFont("comicsansms", 50)
-        small_font = pygame.font.SysFont("comicsansms", 20)
-        # create text to be shown on the game menu
-        welcome_text = big_font.render("Freestyle Chess", False, black_color)
-        created_by = small_font.render(
-            "Created by Neonative", True, black_color)
-        start_btn_label = small_font.render("Play", True, white_color)
-
-        # show welcome text
-        self.screen.blit(welcome_text,
-                         ((self.screen.get_width() - welcome_text.get_width()) // 2,
-                          150))
-        # show credit text
-        self.screen.blit(created_by,
-                         ((self.screen.get_width() - created_by.get_width()) // 2,
-                          self.screen.get_height() - created_by.get_height() - 100))
-        # show text on the Play button
-        self.screen.blit(start_btn_label,
-                         ((start_btn.x + (start_btn.width - start_btn_label.get_width()) // 2,
-                           start_btn.y + (start_btn.height - start_btn_label.get_height()) // 2)))
-
-        # get pressed keys
-        key_pressed = pygame.key.get_pressed()
-        #
-        util = Utils()
+        # coordinates for "Play" button
+        start_btn = self.rect(270, 300, 100, 50)
+
+        # the menu does not change, it is painted once
+        if redraw:
+            # set background color
+            self.screen.fill(white_color)
+            # show play button
+            pygame.draw.rect(self.screen, black_color, start_btn)
+
+            # texts to be shown on the game menu
+            welcome_text = self.cache.label("Freestyle Chess", self.font_size(50),
+                                            black_color, False)
+            created_by = self.cache.label("Created by Neonative", self.font_size(20),
+                                          black_color)
+            start_btn_label = self.cache.label("Play", self.font_size(20), white_color)
+
+            # show welcome text
+            self.screen.blit(welcome_text,
+                             ((self.screen.get_width() - welcome_text.get_width()) // 2,
+                              self.rect(0, 150, 0, 0).y))
+            # show credit text
+            self.screen.blit(created_by,
+                             ((self.screen.get_width() - created_by.get_width()) // 2,
+                              self.rect(0, DESIGN_HEIGHT - 100, 0, 0).y - created_by.get_height()))
+            # show text on the Play button
+            self.screen.blit(start_btn_label,
+                             ((start_btn.x + (start_btn.width - start_btn_label.get_width()) // 2,
+                               start_btn.y + (start_btn.height - start_btn_label.get_height()) // 2)))
 
         # check if left mouse button was clicked
-        if util.left_click_event():
+        if self.utils.left_click_event():
             # call function to get mouse event
-            mouse_coords = util.get_mouse_event()
+            mouse_coords = self.utils.get_mouse_event()
 
             # check if "Play" button was clicked
             if start_btn.collidepoint(mouse_coords[0], mouse_coords[1]):
                 # change button behavior as it is hovered
                 pygame.draw.rect(self.screen, white_color, start_btn, 3)
+                self.dirty.append(start_btn)
 
                 # change menu flag
                 self.menu_showed = True
-            # check if enter or return key was pressed
-            elif key_pressed[K_RETURN]:
-                self.menu_showed = True
 
-    def game(self):
-        # background color
-        color = (0, 0, 0)
-        self.screen.fill(color)
-
-        # draw the chess board
-        self.screen.blit(self.board_img, self.board_dimensions)
-
-        # draw pieces
-        self.chess.draw_pieces()
-
-        # play a turn
-        self.chess.play_turn()
-
-        # draw resign buttons
-        white_resign_btn = pygame.Rect(50, 670, 150, 40)
-        black_resign_btn = pygame.Rect(440, 670, 150, 40)
-        pygame.draw.rect(self.screen, (180, 0, 0), white_resign_btn)
-        pygame.draw.rect(self.screen, (0, 0, 180), black_resign_btn)
-
-        font = pygame.font.SysFont("comicsansms", 20)
-        white_label = font.render("Resign White", True, (255, 255, 255))
-        black_label = font.render("Resign Black", True, (255, 255, 255))
-        self.screen.blit(white_label, (white_resign_btn.x +
-                                       10, white_resign_btn.y + 8))
-        self.screen.blit(black_label, (black_resign_btn.x +
-                                       10, black_resign_btn.y + 8))
-
-    # check for resign click
-        util = Utils()
-        if util.left_click_event():
-            x, y = util.get_mouse_event()
-            if white_resign_btn.collidepoint(x, y):
+    def game(self, redraw=True):
+        # resign buttons
+        white_resign_btn = self.rect(50, 670, 150, 40)
+        black_resign_btn = self.rect(440, 670, 150, 40)
+
+        if redraw:
+            # background color
+            color = (0, 0, 0)
+            self.screen.fill(color)
+
+            # draw resign buttons
+            pygame.draw.rect(self.screen, (180, 0, 0), white_resign_btn)
+            pygame.draw.rect(self.screen, (0, 0, 180), black_resign_btn)
+
+            white_label = self.cache.label("Resign White", self.font_size(20), (255, 255, 255))
+            black_label = self.cache.label("Resign Black", self.font_size(20), (255, 255, 255))
+            self.screen.blit(white_label, (white_resign_btn.x + round(10 * self.scale),
+                                           white_resign_btn.y + round(8 * self.scale)))
+            self.screen.blit(black_label, (black_resign_btn.x + round(10 * self.scale),
+                                           black_resign_btn.y + round(8 * self.scale)))
+
+        # let the computer play its move, the window keeps rendering while
+        # the engine thinks in its own process
+        if self.busy() and self.chess.legal_moves():
+            move = self.think()
+            if move:
+                self.chess.play_move(move)
+
+        # play a turn, the board takes no clicks while the computer or the
+        # remote player is to move
+        if self.player_turn() or not self.chess.legal_moves():
+            played = len(self.chess.history)
+            self.chess.play_turn()
+            if self.client is not None and len(self.chess.history) > played:
+                self.send_move(self.chess.history[-1].move)
+
+        # draw the squares, turn label and engine progress or clocks that
+        # changed
+        info = self.engine.progress() if self.engine is not None else self.clock_text()
+        self.dirty.extend(self.renderer.draw(self.chess, info))
+
+        # check for resign click
+        if self.utils.left_click_event():
+            x, y = self.utils.get_mouse_event()
+            if self.client is not None:
+                # only the player's own side can resign a server game
+                if white_resign_btn.collidepoint(x, y) or black_resign_btn.collidepoint(x, y):
+                    self.client.send("resign", game=self.remote_game)
+            elif white_resign_btn.collidepoint(x, y):
                 self.chess.winner = "Black"
             elif black_resign_btn.collidepoint(x, y):
                 self.chess.winner = "White"
 
-    def declare_winner(self, winner):
-        # background color
-        bg_color = (255, 255, 255)
-        # set background color
-        self.screen.fill(bg_color)
+    def declare_winner(self, winner, redraw=True):
         # black color
         black_color = (0, 0, 0)
-        # coordinates for play again button
-        reset_btn = pygame.Rect(250, 300, 140, 50)
-        # show reset button
-        pygame.draw.rect(self.screen, black_color, reset_btn)
-
         # white color
         white_color = (255, 255, 255)
-        # create fonts for texts
-        big_font = pygame.font.SysFont("comicsansms", 50)
-        small_font = pygame.font.SysFont("comicsansms", 20)
+        # coordinates for play again button
+        reset_btn = self.rect(250, 300, 140, 50)
 
-        # text to show winner
-        text = winner + " wins!"
-        winner_text = big_font.render(text, False, black_color)
+        # the result screen does not change, it is painted once
+        if redraw:
+            # set background color
+            self.screen.fill(white_color)
+            # show reset button
+            pygame.draw.rect(self.screen, black_color, reset_btn)
 
-        # create text to be shown on the reset button
-        reset_label = "Play Again"
-        reset_btn_label = small_font.render(reset_label, True, white_color)
+            # text to show winner
+            text = "Draw!" if winner == "Draw" else winner + " wins!"
+            winner_text = self.cache.label(text, self.font_size(50), black_color, False)
 
-        # show winner text
-        self.screen.blit(winner_text,
-                         ((self.screen.get_width() - winner_text.get_width()) // 2,
-                          150))
+            # text to be shown on the reset button
+            reset_btn_label = self.cache.label("Play Again", self.font_size(20), white_color)
 
-        # show text on the reset button
-        self.screen.blit(reset_btn_label,
-                         ((reset_btn.x + (reset_btn.width - reset_btn_label.get_width()) // 2,
-                           reset_btn.y + (reset_btn.height - reset_btn_label.get_height()) // 2)))
+            # show winner text
+            self.screen.blit(winner_text,
+                             ((self.screen.get_width() - winner_text.get_width()) // 2,
+                              self.rect(0, 150, 0, 0).y))
 
-        # get pressed keys
-        key_pressed = pygame.key.get_pressed()
-        #
-        util = Utils()
+            # show text on the reset button
+            self.screen.blit(reset_btn_label,
+                             ((reset_btn.x + (reset_btn.width - reset_btn_label.get_width()) // 2,
+                               reset_btn.y + (reset_btn.height - reset_btn_label.get_height()) // 2)))
 
         # check if left mouse button was clicked
-        if util.left_click_event():
+        if self.utils.left_click_event():
             # call function to get mouse event
-            mouse_coords = util.get_mouse_event()
+            mouse_coords = self.utils.get_mouse_event()
 
             # check if reset button was clicked
             if reset_btn.collidepoint(mouse_coords[0], mouse_coords[1]):
                 # change button behavior as it is hovered
                 pygame.draw.rect(self.screen, white_color, reset_btn, 3)
+                self.dirty.append(reset_btn)
 
                 # change menu flag
                 self.menu_showed = False
-            # check if enter or return key was pressed
-            elif key_pressed[K_RETURN]:
-                self.menu_showed = False
             # reset game
             self.chess.reset()
             # clear winner
             self.chess.winner = ""
+            if self.client is not None:
+                self.new_remote_game()
@@ -1,5 +1,51 @@
+import argparse
+
 from game import Game
 
 if __name__=="__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Freestyle Chess")
+    parser.add_argument("--ai", choices=["white", "black"],
+                        help="let the computer play this color")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="seconds the computer may think per move")
+    parser.add_argument("--pgn", default="games.pgn",
+                        help="file the P key appends the current game to")
+    parser.add_argument("--size", default="640x750",
+                        help="initial window size as WIDTHxHEIGHT; the window can be resized")
+    parser.add_argument("--connect", metavar="HOST:PORT",
+                        help="play on a game server (python server.py) instead of locally")
+    parser.add_argument("--game", type=int, help="server game to join (default: start one)")
+    parser.add_argument("--color", choices=["white", "black"],
+                        help="seat to take on the server (default: white for a new game, "
+                             "the free seat when joining)")
+    parser.add_argument("--clock", metavar="SECONDS+INCREMENT",
+                        help="clock for a new server game, e.g. 300+2")
+    args = parser.parse_args()
+
+    try:
+        size = tuple(int(value) for value in args.size.lower().split("x"))
+    except ValueError:
+        size = ()
+    if len(size) != 2 or min(size) <= 0:
+        parser.error("--size must look like 1280x1500")
+
+    server = clock = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        if not host or not port.isdigit():
+            parser.error("--connect must look like localhost:8960")
+        server = (host, int(port))
+    if args.clock:
+        try:
+            clock = [float(value) for value in args.clock.split("+")]
+        except ValueError:
+            clock = []
+        if len(clock) == 1:
+            clock.append(0.0)
+        if len(clock) != 2:
+            parser.error("--clock must look like 300+2")
+    color = args.color or ("white" if args.game is None else None)
+
+    game = Game(ai_color=args.ai, think_time=args.think_time, pgn_file=args.pgn, size=size,
+                server=server, game_id=args.game, color=color, clock=clock)
     game.start_game()
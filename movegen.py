@@ -0,0 +1,358 @@
+"""Move generation on top of the bitboard attack tables.
+
+Moves are encoded as ints: source square in bits 0-5, destination in 6-11,
+move kind (NORMAL, PROMOTION, EN_PASSANT, CASTLING) in 12-13 and the
+promotion piece in 14-15. Castling moves have the king's square as source
+and the castling rook's square as destination.
+"""
+
+from board import (WHITE, BLACK, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+                   TYPE_MASK, COLOR_MASK, WHITE_KINGSIDE, WHITE_QUEENSIDE,
+                   BLACK_KINGSIDE, BLACK_QUEENSIDE, NORMAL, PROMOTION, EN_PASSANT, CASTLING,
+                   MOVE_KIND_MASK, square_name, castling_targets)
+from bitboard import (FULL, FILE_A, FILE_H, RANK_3, RANK_6, RANK_1, RANK_8, BIT, BETWEEN,
+                      BISHOP_RAYS, ROOK_RAYS, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+                      bishop_attacks, rook_attacks, queen_attacks)
+
+# castling rights of each side, in the order they are generated
+CASTLING_RIGHTS = {WHITE: (WHITE_KINGSIDE, WHITE_QUEENSIDE),
+                   BLACK: (BLACK_KINGSIDE, BLACK_QUEENSIDE)}
+
+# promotion flags, queen first so it is tried first
+_PROMOTIONS = tuple(PROMOTION | (piece_type - KNIGHT) << 14
+                    for piece_type in (QUEEN, KNIGHT, ROOK, BISHOP))
+
+# letters of promotion pieces in coordinate notation
+_PROMOTION_LETTERS = {KNIGHT: "n", BISHOP: "b", ROOK: "r", QUEEN: "q"}
+
+
+def encode_move(src, des, kind=NORMAL, promotion=None):
+    # promotion is the piece type a pawn turns into, for PROMOTION moves
+    move = src | (des << 6) | kind
+    if promotion is not None:
+        move |= PROMOTION | (promotion - KNIGHT) << 14
+    return move
+
+
+def move_src(move):
+    return move & 63
+
+
+def move_des(move):
+    return (move >> 6) & 63
+
+
+def move_kind(move):
+    return move & MOVE_KIND_MASK
+
+
+def move_promotion(move):
+    # piece type a pawn is promoted to, or EMPTY
+    if move & MOVE_KIND_MASK == PROMOTION:
+        return KNIGHT + ((move >> 14) & 3)
+    return EMPTY
+
+
+def is_capture(board, move):
+    # castling "captures" the own rook, en passant an empty square
+    kind = move & MOVE_KIND_MASK
+    if kind == CASTLING:
+        return False
+    return kind == EN_PASSANT or board.squares[(move >> 6) & 63] != EMPTY
+
+
+def move_name(move):
+    """Coordinate notation, e.g. "e2e4" or "e7e8q"
+
+    Castling is written as the king moving to its rook's square, as in
+    Chess960 UCI.
+    """
+    name = square_name(move & 63) + square_name((move >> 6) & 63)
+    if move & MOVE_KIND_MASK == PROMOTION:
+        name += _PROMOTION_LETTERS[KNIGHT + ((move >> 14) & 3)]
+    return name
+
+
+def attacks_from(board, sq):
+    # bitboard of the squares attacked by the piece on sq
+    piece = board.squares[sq]
+    piece_type = piece & TYPE_MASK
+    if piece_type == PAWN:
+        return PAWN_ATTACKS[piece & COLOR_MASK][sq]
+    if piece_type == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if piece_type == KING:
+        return KING_ATTACKS[sq]
+    occupied = board.bitboards[WHITE] | board.bitboards[BLACK]
+    if piece_type == BISHOP:
+        return bishop_attacks(sq, occupied)
+    if piece_type == ROOK:
+        return rook_attacks(sq, occupied)
+    if piece_type == QUEEN:
+        return queen_attacks(sq, occupied)
+    return 0
+
+
+def is_attacked(board, sq, by):
+    """Check whether any piece of color `by` attacks sq
+
+    Works backwards from the square: a piece attacks sq exactly when a piece
+    of the same kind standing on sq would attack it.
+    """
+    bitboards = board.bitboards
+    if KNIGHT_ATTACKS[sq] & bitboards[by | KNIGHT]:
+        return True
+    if PAWN_ATTACKS[by ^ BLACK][sq] & bitboards[by | PAWN]:
+        return True
+    if KING_ATTACKS[sq] & bitboards[by | KING]:
+        return True
+    occupied = bitboards[WHITE] | bitboards[BLACK]
+    queens = bitboards[by | QUEEN]
+    if bishop_attacks(sq, occupied) & (bitboards[by | BISHOP] | queens):
+        return True
+    if rook_attacks(sq, occupied) & (bitboards[by | ROOK] | queens):
+        return True
+    return False
+
+
+def attackers(board, sq, by, occupied):
+    # bitboard of the pieces of color `by` attacking sq, with sliders
+    # blocked by the given occupancy
+    bitboards = board.bitboards
+    queens = bitboards[by | QUEEN]
+    return ((KNIGHT_ATTACKS[sq] & bitboards[by | KNIGHT])
+            | (PAWN_ATTACKS[by ^ BLACK][sq] & bitboards[by | PAWN])
+            | (KING_ATTACKS[sq] & bitboards[by | KING])
+            | (bishop_attacks(sq, occupied) & (bitboards[by | BISHOP] | queens))
+            | (rook_attacks(sq, occupied) & (bitboards[by | ROOK] | queens)))
+
+
+def in_check(board, color):
+    # a missing king counts as being in check
+    king = board.kings[color]
+    if king is None:
+        return True
+    return is_attacked(board, king, color ^ BLACK)
+
+
+def pseudo_targets(board, sq):
+    # bitboard of the squares the piece on sq can move to, ignoring checks
+    piece = board.squares[sq]
+    color = piece & COLOR_MASK
+    bitboards = board.bitboards
+    own = bitboards[color]
+    if piece & TYPE_MASK != PAWN:
+        return attacks_from(board, sq) & ~own
+
+    enemy = bitboards[color ^ BLACK]
+    empty = ~(own | enemy) & FULL
+    if color == WHITE:
+        one = (BIT[sq] << 8) & empty
+        two = ((one & RANK_3) << 8) & empty
+    else:
+        one = (BIT[sq] >> 8) & empty
+        two = ((one & RANK_6) >> 8) & empty
+    if board.ep is not None:
+        enemy |= BIT[board.ep]
+    return one | two | (PAWN_ATTACKS[color][sq] & enemy)
+
+
+def _add_moves(moves, src, targets):
+    while targets:
+        b = targets & -targets
+        moves.append(src | ((b.bit_length() - 1) << 6))
+        targets ^= b
+
+
+def _add_castling_moves(moves, board, color, king, occupied):
+    """Add the castling moves of one side
+
+    The squares between the king and rook and their destinations must be
+    empty, and the king must not be in check and not cross or land on an
+    attacked square.
+    """
+    enemy = color ^ BLACK
+    if attackers(board, king, enemy, occupied):
+        return
+    castle_rooks = board.castle_rooks
+    for right in CASTLING_RIGHTS[color]:
+        if not board.castling & right:
+            continue
+        rook = castle_rooks[right]
+        king_des, rook_des = castling_targets(king, rook)
+        # the king and rook themselves do not block each other
+        without = occupied ^ BIT[king] ^ BIT[rook]
+        king_path = BETWEEN[king][king_des] | BIT[king_des]
+        if (king_path | BETWEEN[rook][rook_des] | BIT[rook_des]) & without:
+            continue
+        path = king_path
+        while path:
+            b = path & -path
+            if attackers(board, b.bit_length() - 1, enemy, without):
+                break
+            path ^= b
+        if path:
+            continue
+        moves.append(king | (rook << 6) | CASTLING)
+
+
+def _add_en_passant_moves(moves, board, color, king, occupied):
+    # en passant captures that do not leave the king in check; checked by
+    # looking at the board after the capture, which covers the pawns being
+    # pinned along a rank as well as captures of a checking pawn
+    ep = board.ep
+    captured = BIT[ep ^ 8]
+    enemy = color ^ BLACK
+    pawns = PAWN_ATTACKS[enemy][ep] & board.bitboards[color | PAWN]
+    while pawns:
+        b = pawns & -pawns
+        after = (occupied ^ b ^ captured) | BIT[ep]
+        if not attackers(board, king, enemy, after) & ~captured:
+            moves.append((b.bit_length() - 1) | (ep << 6) | EN_PASSANT)
+        pawns ^= b
+
+
+def pins(board, color):
+    """Pieces of `color` pinned to their king
+
+    Returns a dict mapping each pinned square to the bitboard of squares it
+    may still move to: the line between the king and the pinner, plus the
+    pinner itself.
+    """
+    pinned = {}
+    king = board.kings[color]
+    bitboards = board.bitboards
+    enemy = color ^ BLACK
+    own = bitboards[color]
+    occupied = own | bitboards[enemy]
+    queens = bitboards[enemy | QUEEN]
+    snipers = ((BISHOP_RAYS[king] & (bitboards[enemy | BISHOP] | queens))
+               | (ROOK_RAYS[king] & (bitboards[enemy | ROOK] | queens)))
+    while snipers:
+        b = snipers & -snipers
+        sniper = b.bit_length() - 1
+        between = BETWEEN[king][sniper]
+        blockers = between & occupied
+        # exactly one piece in between, and it is ours
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pinned[blockers.bit_length() - 1] = between | b
+        snipers ^= b
+    return pinned
+
+
+def _add_legal_moves(moves, src, targets, pinned):
+    if src in pinned:
+        targets &= pinned[src]
+    while targets:
+        b = targets & -targets
+        moves.append(src | ((b.bit_length() - 1) << 6))
+        targets ^= b
+
+
+def _add_legal_pawn_moves(moves, targets, offset, pinned, last_rank=0):
+    while targets:
+        b = targets & -targets
+        des = b.bit_length() - 1
+        src = des - offset
+        if src not in pinned or pinned[src] & b:
+            if b & last_rank:
+                move = src | (des << 6)
+                moves.extend(move | promotion for promotion in _PROMOTIONS)
+            else:
+                moves.append(src | (des << 6))
+        targets ^= b
+
+
+def legal_moves(board, color):
+    """List of the legal moves of one side
+
+    Checkers and pins are found once for the position, so no move has to
+    be made and taken back to see whether it leaves the king in check.
+    """
+    moves = []
+    king = board.kings[color]
+    if king is None:
+        return moves
+
+    bitboards = board.bitboards
+    enemy = color ^ BLACK
+    own = bitboards[color]
+    occupied = own | bitboards[enemy]
+    not_own = ~own
+
+    # king moves: the king itself is taken off the board so that it
+    # cannot hide behind its own square from a slider checking it
+    without_king = occupied ^ BIT[king]
+    targets = KING_ATTACKS[king] & not_own
+    while targets:
+        b = targets & -targets
+        des = b.bit_length() - 1
+        if not attackers(board, des, enemy, without_king):
+            moves.append(king | (des << 6))
+        targets ^= b
+
+    checkers = attackers(board, king, enemy, occupied)
+    if checkers & (checkers - 1):
+        # double check, only the king can move
+        return moves
+    if checkers:
+        # capture the checker or block the line to it
+        mask = checkers | BETWEEN[king][checkers.bit_length() - 1]
+    else:
+        mask = FULL
+
+    pinned = pins(board, color)
+    enemies = bitboards[enemy] & mask
+    empty = ~occupied & mask
+
+    pawns = bitboards[color | PAWN]
+    if color == WHITE:
+        one = (pawns << 8) & ~occupied & FULL
+        _add_legal_pawn_moves(moves, one & mask, 8, pinned, RANK_8)
+        _add_legal_pawn_moves(moves, ((one & RANK_3) << 8) & empty, 16, pinned)
+        _add_legal_pawn_moves(moves, ((pawns & ~FILE_A) << 7) & enemies, 7, pinned, RANK_8)
+        _add_legal_pawn_moves(moves, ((pawns & ~FILE_H) << 9) & enemies, 9, pinned, RANK_8)
+    else:
+        one = (pawns >> 8) & ~occupied & FULL
+        _add_legal_pawn_moves(moves, one & mask, -8, pinned, RANK_1)
+        _add_legal_pawn_moves(moves, ((one & RANK_6) >> 8) & empty, -16, pinned)
+        _add_legal_pawn_moves(moves, ((pawns & ~FILE_A) >> 9) & enemies, -9, pinned, RANK_1)
+        _add_legal_pawn_moves(moves, ((pawns & ~FILE_H) >> 7) & enemies, -7, pinned, RANK_1)
+    if board.ep is not None:
+        _add_en_passant_moves(moves, board, color, king, occupied)
+    if not checkers and board.castling:
+        _add_castling_moves(moves, board, color, king, occupied)
+
+    targets_mask = not_own & mask
+
+    pieces = bitboards[color | KNIGHT]
+    while pieces:
+        b = pieces & -pieces
+        src = b.bit_length() - 1
+        # a pinned knight can never move
+        if src not in pinned:
+            _add_moves(moves, src, KNIGHT_ATTACKS[src] & targets_mask)
+        pieces ^= b
+
+    pieces = bitboards[color | BISHOP]
+    while pieces:
+        b = pieces & -pieces
+        src = b.bit_length() - 1
+        _add_legal_moves(moves, src, bishop_attacks(src, occupied) & targets_mask, pinned)
+        pieces ^= b
+
+    pieces = bitboards[color | ROOK]
+    while pieces:
+        b = pieces & -pieces
+        src = b.bit_length() - 1
+        _add_legal_moves(moves, src, rook_attacks(src, occupied) & targets_mask, pinned)
+        pieces ^= b
+
+    pieces = bitboards[color | QUEEN]
+    while pieces:
+        b = pieces & -pieces
+        src = b.bit_length() - 1
+        _add_legal_moves(moves, src, queen_attacks(src, occupied) & targets_mask, pinned)
+        pieces ^= b
+
+    return moves
@@ -0,0 +1,210 @@
+"""Headless perft tool for the rules engine.
+
+Counts the leaf nodes of the legal move tree to a given depth, which is
+the standard way to verify a move generator and measure its speed.
+
+    python perft.py --depth 4
+    python perft.py --position BBQNNRKR --depth 3 --divide
+    python perft.py --position 959 --depth 3
+    python perft.py --random --depth 3
+    python perft.py --suite
+    python perft.py --fen "r1k1r2q/p1ppp1pp/8/8/8/8/P1PPP1PP/R1K1R2Q w KQkq - 0 1" --depth 3
+    python perft.py --epd positions.epd --max-depth 4
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from board import Board
+from chess960 import random_back_rank, parse_position, back_rank_to_string, encode
+from movegen import legal_moves, move_name
+from fen import parse_fen, epd_operations, to_fen
+
+# reference positions with expected leaf counts for depth 1, 2, 3, ...:
+# Chess960 start positions, the Chess Programming Wiki perft positions
+# (castling, en passant, promotions and discovered checks) and positions
+# from the Chess960 perft list
+SUITE = [
+    ("RNBQKBNR", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281]),
+    ("RKNBRNBQ", "rknbrnbq/pppppppp/8/8/8/8/PPPPPPPP/RKNBRNBQ w KQkq - 0 1",
+     [20, 400, 8968, 198640]),
+    ("RNBNKRQB", "rnbnkrqb/pppppppp/8/8/8/8/PPPPPPPP/RNBNKRQB w KQkq - 0 1",
+     [20, 400, 8892, 196941]),
+    ("RNKQRBBN", "rnkqrbbn/pppppppp/8/8/8/8/PPPPPPPP/RNKQRBBN w KQkq - 0 1",
+     [19, 361, 7750, 165646]),
+    ("RNKBNQBR", "rnkbnqbr/pppppppp/8/8/8/8/PPPPPPPP/RNKBNQBR w KQkq - 0 1",
+     [20, 400, 9018, 202487]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+    ("960 #1", "bqnb1rkr/pp3ppp/3ppn2/2p5/5P2/P2P4/NPP1P1PP/BQ1BNRKR w HFhf - 2 9",
+     [21, 528, 12189, 326672]),
+    ("960 #2", "2nnrbkr/p1qppppp/8/1ppb4/6PP/3PP3/PPP2P2/BQNNRBKR w HEhe - 1 9",
+     [21, 807, 18002, 667366]),
+    ("960 #3", "b1q1rrkb/pppppppp/3nn3/8/P7/1PPP4/4PPPP/BQNNRKRB w GE - 1 9",
+     [20, 479, 10471, 273318]),
+    ("960 #4", "qbbnnrkr/2pp2pp/p7/1p2pp2/8/P3PP2/1PPP1KPP/QBBNNR1R w hf - 0 9",
+     [22, 593, 13440, 382958]),
+    ("960 #5", "1nbbnrkr/p1p1ppp1/3p4/1p3P1p/3Pq2P/8/PPP1P1P1/QNBBNRKR w HFhf - 0 9",
+     [28, 1120, 31058, 1171749]),
+]
+
+
+def perft(board, depth):
+    """Number of leaf nodes of the legal move tree `depth` plies deep"""
+    moves = legal_moves(board, board.side)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    make_move = board.make_move
+    unmake_move = board.unmake_move
+    for move in moves:
+        undo = make_move(move)
+        nodes += perft(board, depth - 1)
+        unmake_move(move, undo)
+    return nodes
+
+
+def divide(board, depth):
+    """Leaf counts below each root move, as a list of (move, nodes)"""
+    results = []
+    for move in legal_moves(board, board.side):
+        undo = board.make_move(move)
+        results.append((move, perft(board, depth - 1)))
+        board.unmake_move(move, undo)
+    return results
+
+
+def start_board(back_rank):
+    board = Board()
+    board.setup(back_rank)
+    return board
+
+
+def run_suite(max_depth=None):
+    # returns True if every count matches
+    passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for position, fen, counts in SUITE:
+        board = parse_fen(fen)
+        for depth, expected in enumerate(counts, 1):
+            if max_depth is not None and depth > max_depth:
+                break
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected else "FAIL (expected {})".format(expected)
+            if nodes != expected:
+                passed = False
+            print("{} depth {}: {} nodes in {:.3f}s ({:.0f} nps) {}".format(
+                position, depth, nodes, elapsed, nodes / max(elapsed, 1e-9), status))
+    print("total: {} nodes in {:.3f}s ({:.0f} nps)".format(
+        total_nodes, total_time, total_nodes / max(total_time, 1e-9)))
+    return passed
+
+
+def run_epd(path, max_depth=None):
+    """Check every ";D<depth> <count>" operation of an EPD file
+
+    Returns True if every count matches.
+    """
+    passed = True
+    board = Board()
+    with open(path) as lines:
+        for line in lines:
+            if line.strip() and not line.startswith("#"):
+                passed = _check_epd_line(parse_fen(line, board), line, max_depth) and passed
+    return passed
+
+
+def _check_epd_line(board, line, max_depth):
+    passed = True
+    operations = epd_operations(line)
+    depths = sorted(int(op[1:]) for op in operations if op[:1] == "D" and op[1:].isdigit())
+    for depth in depths:
+        if max_depth is not None and depth > max_depth:
+            break
+        expected = int(operations["D{}".format(depth)])
+        nodes = perft(board, depth)
+        if nodes != expected:
+            passed = False
+        print("{} depth {}: {} {}".format(
+            to_fen(board), depth, nodes,
+            "ok" if nodes == expected else "FAIL (expected {})".format(expected)))
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count move generator leaf nodes")
+    parser.add_argument("--position", default="RNBQKBNR",
+                        help="Chess960 back rank (e.g. BBQNNRKR) or position number 0-959 "
+                             "(default: standard chess)")
+    parser.add_argument("--fen", help="start from a FEN, X-FEN or Shredder-FEN position")
+    parser.add_argument("--epd", help="check the ;D<depth> counts of every line of an EPD file")
+    parser.add_argument("--random", action="store_true",
+                        help="use a random Chess960 start position")
+    parser.add_argument("--seed", type=int, help="seed for --random")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true",
+                        help="print the node count below each root move")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the reference suite and exit non-zero on a mismatch")
+    parser.add_argument("--max-depth", type=int,
+                        help="skip suite entries deeper than this")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 0 if run_suite(args.max_depth) else 1
+    if args.epd:
+        return 0 if run_epd(args.epd, args.max_depth) else 1
+
+    if args.fen:
+        try:
+            board = parse_fen(args.fen)
+        except ValueError as e:
+            parser.error(str(e))
+        print("position {} depth {}".format(to_fen(board), args.depth))
+    else:
+        if args.random:
+            back_rank = random_back_rank(random.Random(args.seed))
+        else:
+            try:
+                back_rank = parse_position(args.position)
+            except ValueError as e:
+                parser.error(str(e))
+        board = start_board(back_rank)
+        print("position {} ({}) depth {}".format(
+            back_rank_to_string(back_rank), encode(back_rank), args.depth))
+
+    start = time.perf_counter()
+    if args.divide:
+        nodes = 0
+        for move, count in divide(board, args.depth):
+            print("{}: {}".format(move_name(move), count))
+            nodes += count
+    else:
+        nodes = perft(board, args.depth)
+    elapsed = time.perf_counter() - start
+
+    print("nodes: {}".format(nodes))
+    print("time: {:.3f}s".format(elapsed))
+    print("nps: {:.0f}".format(nodes / max(elapsed, 1e-9)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
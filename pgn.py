@@ -0,0 +1,300 @@
+"""PGN export and a streaming PGN reader.
+
+format_game() writes a game as PGN with SAN moves; positions that do not
+start from the standard setup get SetUp/FEN headers (X-FEN castling for
+Chess960). read_games() is a generator that parses one game at a time from
+a file or any iterable of lines, so archives of any size are replayed in
+constant memory.
+
+    for game in read_games("archive.pgn"):
+        board = game.start_board()
+        for move in game.replay(board):
+            ...
+
+Run as a script to re-validate every move of an archive:
+
+    python pgn.py archive.pgn
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from board import (WHITE, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, TYPE_MASK,
+                   CASTLING, MOVE_KIND_MASK, square_name)
+from fen import parse_fen, to_fen, STARTING_FEN
+from movegen import legal_moves, in_check, is_capture, move_src, move_des, move_promotion
+
+# result strings as used in PGN, by the winner recorded in Rules
+RESULTS = {"White": "1-0", "Black": "0-1", "Draw": "1/2-1/2", "": "*"}
+
+# the seven tag roster, written first and in this order
+ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+_ROSTER_DEFAULTS = {"Event": "?", "Site": "?", "Date": "????.??.??", "Round": "?",
+                    "White": "?", "Black": "?", "Result": "*"}
+
+# SAN letter of each piece type, and back
+SAN_LETTERS = {KNIGHT: "N", BISHOP: "B", ROOK: "R", QUEEN: "Q", KING: "K"}
+SAN_TYPES = {letter: piece_type for piece_type, letter in SAN_LETTERS.items()}
+
+_SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+_CASTLING_SAN = {"O-O": True, "0-0": True, "O-O-O": False, "0-0-0": False}
+_HEADER = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_TOKEN = re.compile(r"[{}();]|1-0|0-1|1/2-1/2|\*|\$\d+|\d+\.+|[^\s{}();$]+")
+_RESULT_TOKENS = {"1-0", "0-1", "1/2-1/2", "*"}
+_LINE_WIDTH = 79
+
+
+def san(board, move, moves=None):
+    """Standard algebraic notation of a legal move, before it is played
+
+    `moves` are the legal moves of the position, if already known.
+    """
+    if moves is None:
+        moves = legal_moves(board, board.side)
+    src = move_src(move)
+    des = move_des(move)
+    piece = board.squares[src]
+    capture = is_capture(board, move)
+    if move & MOVE_KIND_MASK == CASTLING:
+        # the rook is on the h side of the king for short castling
+        text = "O-O" if des > src else "O-O-O"
+    elif piece & TYPE_MASK == PAWN:
+        text = square_name(src)[0] + "x" if capture else ""
+        text += square_name(des)
+        if move_promotion(move):
+            text += "=" + SAN_LETTERS[move_promotion(move)]
+    else:
+        text = SAN_LETTERS[piece & TYPE_MASK]
+        # other pieces of the same kind that can also reach the destination
+        others = [move_src(other) for other in moves
+                  if move_des(other) == des and move_src(other) != src
+                  and board.squares[move_src(other)] == piece]
+        if others:
+            if all(other & 7 != src & 7 for other in others):
+                text += square_name(src)[0]
+            elif all(other >> 3 != src >> 3 for other in others):
+                text += square_name(src)[1]
+            else:
+                text += square_name(src)
+        if capture:
+            text += "x"
+        text += square_name(des)
+
+    undo = board.make_move(move)
+    if in_check(board, board.side):
+        text += "+" if legal_moves(board, board.side) else "#"
+    board.unmake_move(move, undo)
+    return text
+
+
+def parse_san(board, text, moves=None):
+    """Encoded legal move for a SAN string in a board's position
+
+    Raises ValueError if the move is malformed, illegal or ambiguous.
+    """
+    if moves is None:
+        moves = legal_moves(board, board.side)
+    stripped = text.rstrip("+#!?")
+    if stripped in _CASTLING_SAN:
+        short = _CASTLING_SAN[stripped]
+        for move in moves:
+            if move & MOVE_KIND_MASK == CASTLING and (move_des(move) > move_src(move)) == short:
+                return move
+        raise ValueError("illegal move {!r} in {}".format(text, to_fen(board)))
+    match = _SAN.match(stripped)
+    if match is None:
+        raise ValueError("malformed move {!r}".format(text))
+    letter, file, rank, capture, destination, promotion = match.groups()
+    promotion = SAN_TYPES[promotion] if promotion else EMPTY
+    piece_type = SAN_TYPES[letter] if letter else PAWN
+    des = (ord(destination[0]) - 97) | (ord(destination[1]) - 49) << 3
+    squares = board.squares
+    candidates = []
+    for move in moves:
+        src = move_src(move)
+        if (move_des(move) == des and squares[src] & TYPE_MASK == piece_type
+                and move & MOVE_KIND_MASK != CASTLING and move_promotion(move) == promotion
+                and (file is None or src & 7 == ord(file) - 97)
+                and (rank is None or src >> 3 == ord(rank) - 49)):
+            candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError("{} move {!r} in {}".format(
+            "illegal" if not candidates else "ambiguous", text, to_fen(board)))
+    return candidates[0]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def format_game(start_fen, moves, result="*", headers=None):
+    """PGN text of a game given its start position and encoded moves
+
+    `headers` adds or overrides tags; the seven tag roster is always
+    written, and SetUp/FEN when the game does not start from the standard
+    position.
+    """
+    tags = dict(_ROSTER_DEFAULTS)
+    tags.update(headers or {})
+    tags["Result"] = result
+    if start_fen != STARTING_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+    lines = ['[{} "{}"]'.format(name, _escape(tags[name])) for name in ROSTER]
+    lines.extend('[{} "{}"]'.format(name, _escape(value))
+                 for name, value in tags.items() if name not in ROSTER)
+    lines.append("")
+
+    # movetext, wrapped at the usual line width
+    board = parse_fen(start_fen)
+    tokens = []
+    for i, move in enumerate(moves):
+        if board.side == WHITE:
+            tokens.append("{}.".format(board.fullmove))
+        elif i == 0:
+            tokens.append("{}...".format(board.fullmove))
+        tokens.append(san(board, move))
+        board.make_move(move)
+    tokens.append(result)
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > _LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + " " + token if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+class PGNGame(object):
+    """One game read from a PGN file: tags, SAN moves and result"""
+
+    def __init__(self):
+        self.headers = {}
+        self.moves = []
+        self.result = "*"
+
+    def start_board(self):
+        return parse_fen(self.headers.get("FEN", STARTING_FEN))
+
+    def replay(self, board=None):
+        """Play the moves on a board, yielding each encoded move after it is made
+
+        The board defaults to the start position. Raises ValueError at the
+        first illegal move.
+        """
+        if board is None:
+            board = self.start_board()
+        for text in self.moves:
+            move = parse_san(board, text)
+            board.make_move(move)
+            yield move
+
+    def encoded_moves(self):
+        return list(self.replay())
+
+    def __str__(self):
+        return format_game(self.headers.get("FEN", STARTING_FEN), self.encoded_moves(),
+                           self.result, self.headers)
+
+
+def read_games(source):
+    """Generate a PGNGame for every game in a PGN file
+
+    `source` is a file name or an iterable of lines. Comments, NAGs and
+    variations are skipped; only the main line is kept.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace") as lines:
+            for game in read_games(lines):
+                yield game
+        return
+
+    game = PGNGame()
+    # inside a {comment}, and how deep inside (variations)
+    in_comment = False
+    depth = 0
+    started = False
+    for line in source:
+        if not in_comment:
+            stripped = line.strip()
+            if stripped.startswith("%") or not stripped:
+                continue
+            if stripped[0] == "[":
+                header = _HEADER.match(stripped)
+                if header is not None:
+                    # tags after movetext start the next game
+                    if game.moves:
+                        yield game
+                        game = PGNGame()
+                        depth = 0
+                    value = header.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                    game.headers[header.group(1)] = value
+                    started = True
+                    continue
+        for token in _TOKEN.findall(line):
+            if in_comment:
+                if token == "}":
+                    in_comment = False
+            elif token == "{":
+                in_comment = True
+            elif token == ";":
+                # comment to the end of the line
+                break
+            elif token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(0, depth - 1)
+            elif depth or token[0] == "$" or token[-1] == ".":
+                # variation moves, NAGs and move numbers
+                continue
+            elif token in _RESULT_TOKENS:
+                game.result = token
+                yield game
+                game = PGNGame()
+                started = False
+            else:
+                game.moves.append(token.rstrip("!?"))
+                started = True
+    if started:
+        yield game
+
+
+def validate(source, out=sys.stdout):
+    """Replay every game of a PGN archive, reporting illegal moves
+
+    Returns (number of games, number of games with errors).
+    """
+    games = errors = 0
+    for games, game in enumerate(read_games(source), 1):
+        try:
+            for move in game.replay():
+                pass
+        except ValueError as e:
+            errors += 1
+            out.write("game {} ({} - {}): {}\n".format(
+                games, game.headers.get("White", "?"), game.headers.get("Black", "?"), e))
+    return games, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay and validate PGN archives")
+    parser.add_argument("files", nargs="+", help="PGN files")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.files:
+        start = time.perf_counter()
+        games, errors = validate(path)
+        elapsed = time.perf_counter() - start
+        print("{}: {} games, {} with errors in {:.1f}s ({:.0f} games/s)".format(
+            path, games, errors, elapsed, games / max(elapsed, 1e-9)))
+        failed = failed or errors > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,13 +24,31 @@ class Piece(pygame.sprite.Sprite):
         self.rows = rows
         self.cell_count = cols * rows
 
-        self.rect = self.spritesheet.get_rect()
+        # sheet the pieces are drawn from, the spritesheet scaled to the board
+        self.sheet = self.spritesheet
+        self.slice_cells()
+
+    def slice_cells(self):
+        self.rect = self.sheet.get_rect()
         w = self.cell_width = self.rect.width // self.cols
         h = self.cell_height = self.rect.height // self.rows
+        cols = self.cols
 
         self.cells = list([(i % cols * w, i // cols * h, w, h) for i in range(self.cell_count)])
 
+    def resize(self, scale, cache):
+        """Draw the pieces `scale` times their size in the spritesheet
+
+        The scaled sheet comes from a ResourceCache, so it is smoothscaled
+        once per size rather than on every blit.
+        """
+        width, height = self.spritesheet.get_size()
+        self.sheet = cache.scaled("pieces", self.spritesheet,
+                                  (max(round(width * scale), self.cols),
+                                   max(round(height * scale), self.rows)))
+        self.slice_cells()
+
     def draw(self, surface, piece_name, coords):
         piece_index = self.pieces[piece_name]
-        surface.blit(self.spritesheet, coords, self.cells[piece_index])
+        surface.blit(self.sheet, coords, self.cells[piece_index])
 
@@ -0,0 +1,110 @@
+"""Dirty-rectangle renderer for the game screen.
+
+Renderer remembers what every board square showed when it was last drawn
+(piece and highlight) and which turn label was shown, and repaints only
+what changed since. draw() returns the rects it painted so the game loop
+can pass them to pygame.display.update() instead of flipping the whole
+screen; an untouched board costs one comparison per frame.
+"""
+
+import pygame
+
+from board import EMPTY, PIECE_NAMES, coords
+
+# color of the bar above the board
+BAR_COLOR = (0, 0, 0)
+# color of the turn label
+LABEL_COLOR = (255, 255, 255)
+# color of the line showing the computer's thinking
+INFO_COLOR = (170, 170, 170)
+# font sizes, and how far above the board the turn label starts, at the
+# 640 pixel board size; they scale with the board
+LABEL_SIZE = 20
+INFO_SIZE = 14
+LABEL_HEIGHT = 40
+
+
+class Renderer(object):
+    def __init__(self, screen, board_img, board_offset, pieces, cache):
+        # display surface
+        self.screen = screen
+        # chess board image and where its top left corner is drawn
+        self.board_img = board_img
+        self.board_offset = board_offset
+        # Piece spritesheet
+        self.pieces = pieces
+        # ResourceCache holding the label font and highlight overlays
+        self.cache = cache
+        # size of the board relative to the 640 pixel board image
+        self.scale = 1.0
+        self.invalidate()
+
+    def resize(self, screen, board_img, board_offset, scale):
+        """Draw on a resized window with a board image scaled to fit it"""
+        self.screen = screen
+        self.board_img = board_img
+        self.board_offset = board_offset
+        self.scale = scale
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget what is on screen, the next draw() repaints everything"""
+        # (piece code, highlight color) last drawn on every square
+        self.shown = [None] * 64
+        # (turn label, engine line) shown in the bar
+        self.bar = None
+        # board hash, selection and moves of the last draw
+        self.state = None
+
+    def draw(self, chess, info=""):
+        """Repaint the squares and labels of a Chess game that changed
+
+        `info` is a line of engine progress shown under the turn label.
+        Returns the list of screen rects that were painted.
+        """
+        rects = []
+        text = "Turn: Black" if chess.turn["black"] else "Turn: White"
+        if (text, info) != self.bar:
+            rects.append(self.draw_bar(text, info))
+            self.bar = (text, info)
+
+        state = (chess.board.hash, chess.selected, [tuple(move) for move in chess.moves])
+        if state == self.state:
+            return rects
+        self.state = state
+
+        highlights = chess.highlights()
+        squares = chess.board.squares
+        length = chess.square_length
+        for sq in range(64):
+            shown = (squares[sq], highlights.get(sq))
+            if shown == self.shown[sq]:
+                continue
+            self.shown[sq] = shown
+            x, y = coords(sq)
+            rect = pygame.Rect(chess.board_locations[x][y], (length, length))
+            # board image under the square, then highlight and piece
+            self.screen.blit(self.board_img, rect,
+                             rect.move(-self.board_offset[0], -self.board_offset[1]))
+            if shown[1] is not None:
+                self.screen.blit(self.cache.overlay(shown[1], length), rect)
+            if shown[0] != EMPTY:
+                self.pieces.draw(self.screen, PIECE_NAMES[shown[0]], rect.topleft)
+            rects.append(rect)
+        return rects
+
+    def draw_bar(self, text, info=""):
+        # the bar above the board with the turn label centred in it
+        rect = pygame.Rect(0, 0, self.screen.get_width(), self.board_offset[1])
+        self.screen.fill(BAR_COLOR, rect)
+        label = self.cache.label(text, self.font_size(LABEL_SIZE), LABEL_COLOR)
+        top = max(rect.height - round(LABEL_HEIGHT * self.scale), 0)
+        self.screen.blit(label, ((rect.width - label.get_width()) // 2, top))
+        if info:
+            # changes with every iteration, so it is not kept in the cache
+            line = self.cache.font(self.font_size(INFO_SIZE)).render(info, True, INFO_COLOR)
+            self.screen.blit(line, (8, rect.height - line.get_height() - 2))
+        return rect
+
+    def font_size(self, size):
+        return max(round(size * self.scale), 6)
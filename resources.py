@@ -0,0 +1,77 @@
+"""Cache of fonts, rendered labels, highlight overlays and scaled images.
+
+pygame.font.SysFont scans the system fonts on every call, and rendering
+text or filling translucent surfaces allocates new surfaces, so the UI asks
+a ResourceCache instead and gets the same objects back frame after frame.
+Images scaled to the window size are kept the same way. Call invalidate()
+when the window size or the theme (font) changes.
+"""
+
+import pygame
+
+# font used for all texts
+FONT_NAME = "comicsansms"
+
+
+class ResourceCache(object):
+    def __init__(self, font_name=FONT_NAME):
+        self.font_name = font_name
+        # size -> Font
+        self.fonts = {}
+        # (text, size, color, antialias) -> rendered Surface
+        self.labels = {}
+        # (color, width, height) -> filled SRCALPHA Surface
+        self.overlays = {}
+        # (name, size) -> smoothscaled image
+        self.images = {}
+
+    def invalidate(self, font_name=None):
+        """Drop everything cached, optionally switching to another font"""
+        if font_name is not None:
+            self.font_name = font_name
+        self.fonts = {}
+        self.labels = {}
+        self.overlays = {}
+        self.images = {}
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.SysFont(self.font_name, size)
+        return font
+
+    def label(self, text, size, color, antialias=True):
+        # surface with the text rendered in the cached font of that size
+        key = (text, size, color, antialias)
+        surface = self.labels.get(key)
+        if surface is None:
+            surface = self.labels[key] = self.font(size).render(text, antialias, color)
+        return surface
+
+    def preload(self, labels):
+        """Render (text, size, color[, antialias]) labels ahead of use"""
+        for label in labels:
+            self.label(*label)
+
+    def scaled(self, name, image, size):
+        # image smoothscaled to a (width, height) size, `name` identifies it
+        key = (name, size)
+        surface = self.images.get(key)
+        if surface is None:
+            if image.get_size() == size:
+                surface = image
+            else:
+                surface = pygame.transform.smoothscale(image, size)
+            self.images[key] = surface
+        return surface
+
+    def overlay(self, color, width, height=None):
+        # translucent surface of the given size filled with an RGBA color
+        if height is None:
+            height = width
+        key = (color, width, height)
+        surface = self.overlays.get(key)
+        if surface is None:
+            surface = self.overlays[key] = pygame.Surface((width, height), pygame.SRCALPHA)
+            surface.fill(color)
+        return surface
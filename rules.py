@@ -0,0 +1,375 @@
+"""Headless Chess960 rules engine.
+
+Rules holds a position, whose turn it is and the game result, and knows
+nothing about pygame, so it can be imported and run on machines without a
+display. The Chess class in chess.py wraps it for rendering and input.
+"""
+
+from board import (Board, EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK,
+                   COLOR_MASK, TYPE_MASK, CASTLING, MOVE_KIND_MASK, COLOR_NAMES, COLOR_CODES,
+                   PIECE_NAMES, PIECE_CODES, square, coords, castling_targets)
+from chess960 import random_position_id, decode, encode, STANDARD
+from fen import parse_fen, to_fen
+from pgn import format_game, RESULTS
+from bitboard import squares_of, bishop_attacks, rook_attacks, LIGHT_SQUARES, DARK_SQUARES
+from movegen import (in_check, pseudo_targets, legal_moves, move_src, move_des, move_promotion,
+                     CASTLING_RIGHTS)
+
+
+# halfmove clock value at which the fifty-move rule ends the game
+FIFTY_MOVES = 100
+
+
+def needs_chess960_castling(board):
+    """True if a side may castle from a setup standard chess cannot have
+
+    That is a king with castling rights off its e-file square, or one of
+    its castling rooks off the a- and h-files. PGN readers then need the
+    Chess960 variant tag to read the castling rights right.
+    """
+    for color, king_square in ((WHITE, 4), (BLACK, 60)):
+        for right in CASTLING_RIGHTS[color]:
+            if not board.castling & right:
+                continue
+            if board.kings[color] != king_square or board.castle_rooks[right] & 7 not in (0, 7):
+                return True
+    return False
+
+
+def insufficient_material(board):
+    """True if neither side has the material to ever checkmate
+
+    That is king against king with at most one knight or bishop, or any
+    number of bishops that all stand on squares of the same color.
+    """
+    bitboards = board.bitboards
+    if (bitboards[WHITE | PAWN] | bitboards[BLACK | PAWN] | bitboards[WHITE | ROOK]
+            | bitboards[BLACK | ROOK] | bitboards[WHITE | QUEEN] | bitboards[BLACK | QUEEN]):
+        return False
+    knights = bitboards[WHITE | KNIGHT] | bitboards[BLACK | KNIGHT]
+    bishops = bitboards[WHITE | BISHOP] | bitboards[BLACK | BISHOP]
+    minors = knights | bishops
+    # no minor piece, or a single one
+    if minors & (minors - 1) == 0:
+        return True
+    return not knights and (not bishops & LIGHT_SQUARES or not bishops & DARK_SQUARES)
+
+
+class MoveRecord(object):
+    """A played move with the board state needed to take it back"""
+
+    def __init__(self, move, undo):
+        self.move = move
+        self.src = move_src(move)
+        self.des = move_des(move)
+        # state before the move, as returned by Board.make_move
+        self.captured, self.castling, self.ep, self.hash, self.halfmove = undo
+
+    def undo(self):
+        # the state tuple Board.unmake_move expects
+        return self.captured, self.castling, self.ep, self.hash, self.halfmove
+
+
+class Rules(object):
+    def __init__(self):
+        # list containing the names of captured pieces
+        self.captured = []
+        # "White", "Black" or "Draw" once the game is over
+        self.winner = ""
+        # Scharnagl number (0-959) of the starting position, None when the
+        # game was loaded from a FEN
+        self.position_id = None
+        # array and bitboard backed board
+        self.board = Board()
+        # FEN of the starting position
+        self.start_fen = None
+        # MoveRecord of every move played, and moves taken back that can
+        # be played again with redo()
+        self.history = []
+        self.redo_moves = []
+        # how often each position hash occurred in the game so far
+        self.repetitions = {}
+        # legal moves of the side to move, see move_cache()
+        self._move_cache = None
+
+        self.reset()
+
+    def reset(self, back_rank=None, position_id=None):
+        """Start a new game
+
+        The start position is given as a back rank, as a Scharnagl number
+        (518 is standard chess), or picked at random if neither is given.
+        """
+        self.captured = []
+        self.winner = ""
+        self.history = []
+        self.redo_moves = []
+
+        # === Generate Chess960 Starting Position ===
+        if back_rank is not None:
+            position_id = encode(back_rank)
+        elif position_id is None:
+            position_id = random_position_id()
+        back_rank = decode(position_id)
+        self.position_id = position_id
+
+        # === Place pieces on board, white to move ===
+        self.board.setup(back_rank)
+        self.start_fen = to_fen(self.board)
+        self.repetitions = {self.board.hash: 1}
+
+    def load_fen(self, text):
+        """Start from a FEN, X-FEN or Shredder-FEN position"""
+        # parse first so a bad string leaves the current game untouched
+        board = parse_fen(text)
+        self.captured = []
+        self.winner = ""
+        self.history = []
+        self.redo_moves = []
+        self.position_id = None
+        self.board = board
+        self.start_fen = to_fen(board)
+        self.repetitions = {board.hash: 1}
+
+    def fen(self, shredder=False):
+        # FEN of the current position
+        return to_fen(self.board, shredder)
+
+    def pgn(self, headers=None):
+        """PGN of the game so far; `headers` adds or overrides tags"""
+        tags = {}
+        if self.position_id is not None:
+            chess960 = self.position_id != STANDARD
+        else:
+            # set up from a FEN, which may still be a Chess960 start
+            chess960 = needs_chess960_castling(parse_fen(self.start_fen))
+        if chess960:
+            tags["Variant"] = "Chess960"
+        tags.update(headers or {})
+        return format_game(self.start_fen, self.move_list, RESULTS[self.winner], tags)
+
+    @property
+    def side(self):
+        # color code of the side to move
+        return self.board.side
+
+    @property
+    def turn(self):
+        # dictionary to keeping track of player turn
+        return {"white": int(self.board.side == WHITE),
+                "black": int(self.board.side == BLACK)}
+
+    @property
+    def hash(self):
+        # Zobrist hash identifying the current position
+        return self.board.hash
+
+    @property
+    def move_list(self):
+        # encoded moves played since the start position
+        return [record.move for record in self.history]
+
+    @property
+    def ply(self):
+        # number of moves played since the start position
+        return len(self.history)
+
+    def move_cache(self):
+        """(hash, legal moves, in check, destinations by square) of the position
+
+        Computed once per position and shared by move highlights, click
+        validation and game end detection; a made or undone move changes
+        the hash, which invalidates it.
+        """
+        cache = self._move_cache
+        board = self.board
+        if cache is None or cache[0] != board.hash:
+            cache = self._move_cache = (board.hash, legal_moves(board, board.side),
+                                        in_check(board, board.side), {})
+        return cache
+
+    def legal_moves(self):
+        # legal moves of the side to move, encoded as in movegen; the list
+        # is shared, callers must not change it
+        return self.move_cache()[1]
+
+    def make_move(self, move):
+        """Play an encoded move for the side to move and pass the turn
+
+        Returns the code of the captured piece (EMPTY if none).
+        """
+        record = MoveRecord(move, self.board.make_move(move))
+        self.history.append(record)
+        key = self.board.hash
+        self.repetitions[key] = self.repetitions.get(key, 0) + 1
+        # a new move discards the moves that were taken back
+        if self.redo_moves:
+            if self.redo_moves[-1] == move:
+                self.redo_moves.pop()
+            else:
+                self.redo_moves = []
+        captured = record.captured
+        if captured != EMPTY:
+            # add the captured piece to list
+            self.captured.append(PIECE_NAMES[captured])
+            # capturing the king ends the game
+            if captured & TYPE_MASK == KING:
+                self.winner = "Black" if captured & COLOR_MASK == WHITE else "White"
+        return captured
+
+    def undo(self):
+        """Take back the last move
+
+        Returns its MoveRecord, or None at the start of the game.
+        """
+        if not self.history:
+            return None
+        record = self.history.pop()
+        key = self.board.hash
+        if self.repetitions[key] == 1:
+            del self.repetitions[key]
+        else:
+            self.repetitions[key] -= 1
+        self.board.unmake_move(record.move, record.undo())
+        if record.captured != EMPTY:
+            self.captured.pop()
+        # the game goes on from the earlier position
+        self.winner = ""
+        self.redo_moves.append(record.move)
+        return record
+
+    def redo(self):
+        """Play the last move taken back again
+
+        Returns the move, or None if there is nothing to redo.
+        """
+        if not self.redo_moves:
+            return None
+        move = self.redo_moves[-1]
+        self.make_move(move)
+        return move
+
+    def go_to_ply(self, ply):
+        """Undo or redo moves until `ply` moves have been played
+
+        Moves past the current one can only be reached if they were taken
+        back before. Returns the ply reached.
+        """
+        while len(self.history) > max(ply, 0):
+            self.undo()
+        while len(self.history) < ply and self.redo_moves:
+            self.redo()
+        return len(self.history)
+
+    def is_repetition(self, count=3):
+        # the current position occurred at least `count` times
+        return self.repetitions.get(self.board.hash, 0) >= count
+
+    def check_game_end(self):
+        """Set the winner if the game is over in the current position
+
+        Returns "checkmate", "stalemate", "threefold repetition",
+        "fifty-move rule", "insufficient material" or None.
+        """
+        # a repeated position had legal moves before, and a dead position
+        # is drawn whatever, so both are settled without generating moves
+        if self.is_repetition():
+            self.winner = "Draw"
+            return "threefold repetition"
+        if insufficient_material(self.board):
+            self.winner = "Draw"
+            return "insufficient material"
+        current = COLOR_NAMES[self.side]
+        if self.has_legal_moves(current):
+            # checkmate on the hundredth halfmove still counts
+            if self.board.halfmove >= FIFTY_MOVES:
+                self.winner = "Draw"
+                return "fifty-move rule"
+            return None
+        if self.is_in_check(current):
+            self.winner = "Black" if current == "white" else "White"
+            return "checkmate"
+        self.winner = "Draw"
+        return "stalemate"
+
+    # method to find the possible moves of the selected piece
+
+    def possible_moves(self, piece_name, piece_coord, simulate=False):
+        # list to store possible moves of the selected piece
+        positions = []
+        # find the possible locations to put a piece
+        if len(piece_name) > 0:
+            piece = PIECE_CODES[piece_name]
+            src = square(*piece_coord)
+            if simulate:
+                positions = [coords(des) for des in
+                             squares_of(pseudo_targets(self.board, src))]
+            elif piece & COLOR_MASK == self.side:
+                # a castling king can be dropped on its rook or, where that
+                # is not also a plain king move, on its castling square
+                targets = self.move_cache()[3]
+                if src not in targets:
+                    targets[src] = self.destinations(src, self.legal_moves())
+                positions = [coords(des) for des in targets[src]]
+            else:
+                positions = [coords(des) for des in
+                             self.destinations(src, legal_moves(self.board, piece & COLOR_MASK))]
+
+        # return list containing possible moves for the selected piece
+        return positions
+
+    def destinations(self, src, moves):
+        # squares the piece on src can be dropped on to play one of `moves`
+        targets = []
+        for move in moves:
+            if move_src(move) == src and move_des(move) not in targets:
+                targets.append(move_des(move))
+        for move in moves:
+            if move_src(move) == src and move & MOVE_KIND_MASK == CASTLING:
+                king_des = castling_targets(src, move_des(move))[0]
+                if king_des not in targets:
+                    targets.append(king_des)
+        return targets
+
+    def find_move(self, src, des, promotion=QUEEN):
+        """Legal move of the piece on src that ends on des, or None
+
+        des may also be the king's castling square. Pawns reaching the last
+        rank promote to `promotion`.
+        """
+        moves = [move for move in self.legal_moves() if move_src(move) == src]
+        for move in moves:
+            if move_des(move) == des and move_promotion(move) in (EMPTY, promotion):
+                return move
+        for move in moves:
+            if (move & MOVE_KIND_MASK == CASTLING
+                    and castling_targets(src, move_des(move))[0] == des):
+                return move
+        return None
+
+    # helper function to find diagonal moves
+
+    def diagonal_moves(self, positions, piece_name, piece_coord):
+        attacks = bishop_attacks(square(*piece_coord), self.board.occupied())
+        positions.extend(coords(des) for des in squares_of(attacks))
+
+        return positions
+
+    # helper function to find horizontal and vertical moves
+
+    def linear_moves(self, positions, piece_name, piece_coord):
+        attacks = rook_attacks(square(*piece_coord), self.board.occupied())
+        positions.extend(coords(des) for des in squares_of(attacks))
+
+        return positions
+
+    def is_in_check(self, color):
+        # king missing = game over, which in_check reports as check
+        if COLOR_CODES[color] == self.side:
+            return self.move_cache()[2]
+        return in_check(self.board, COLOR_CODES[color])
+
+    def has_legal_moves(self, color):
+        if COLOR_CODES[color] == self.side:
+            return len(self.move_cache()[1]) > 0
+        return len(legal_moves(self.board, COLOR_CODES[color])) > 0
@@ -0,0 +1,310 @@
+"""Alpha-beta search for the computer opponent.
+
+Negamax alpha-beta with iterative deepening, a transposition table,
+quiescence search on captures, and move ordering by hash move, MVV-LVA
+captures, killer moves and the history heuristic.
+
+    engine = Search()
+    move = engine.best_move(chess, time_limit=1.0)
+"""
+
+import time
+
+from board import EMPTY, PAWN, QUEEN, TYPE_MASK, PROMOTION, EN_PASSANT, CASTLING, MOVE_KIND_MASK
+from evaluate import evaluate, PIECE_VALUES
+from movegen import legal_moves, in_check, move_name, move_promotion
+from tt import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+
+INFINITY = 1000000
+MATE = 100000
+MAX_PLY = 128
+# scores beyond this are mates, stored in the table relative to the node
+MATE_BOUND = MATE - MAX_PLY
+
+# ordering scores, highest first
+_HASH_MOVE = 1 << 30
+_CAPTURE = 1 << 28
+_KILLER_1 = 1 << 27
+_KILLER_2 = _KILLER_1 - 1
+
+# nodes searched between two checks of the time budget
+_CHECK_INTERVAL = 1024
+
+
+def _tactical_score(squares, move):
+    """Ordering score of a capture or promotion, None for quiet moves
+
+    Most valuable victim first, then least valuable attacker, with the
+    value of a promotion piece added.
+    """
+    kind = move & MOVE_KIND_MASK
+    if kind == CASTLING:
+        return None
+    if kind == EN_PASSANT:
+        victim = PAWN
+    else:
+        victim = squares[(move >> 6) & 63] & TYPE_MASK
+    if victim == EMPTY and kind != PROMOTION:
+        return None
+    score = PIECE_VALUES[victim] * 16 - (squares[move & 63] & TYPE_MASK)
+    if kind == PROMOTION:
+        score += PIECE_VALUES[move_promotion(move)] * 16
+    return score
+
+
+class Search(object):
+    def __init__(self, tt_size_mb=16):
+        # positions are remembered between searches
+        self.tt = TranspositionTable(tt_size_mb)
+        # two quiet moves per ply that recently caused a beta cutoff
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        # cutoff counts of quiet moves, indexed by src | des << 6
+        self.history = [0] * 4096
+        self.nodes = 0
+        self.stopped = False
+        # optional function polled with the time budget; the search stops
+        # as soon as it returns True
+        self.abort = None
+        # results of the last completed iteration
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+
+    def best_move(self, rules, time_limit=None, depth=None, nodes=None, info=None):
+        """Best move for the position of a Rules (or Chess) object, or 0"""
+        played = [record.hash for record in rules.history]
+        return self.search(rules.board, time_limit, depth, nodes, info, played)
+
+    def search(self, board, time_limit=None, depth=None, nodes=None, info=None, played=()):
+        """Search a board with iterative deepening until a limit is reached
+
+        time_limit is in seconds, depth in plies, nodes in visited nodes; with
+        no limit at all the search runs to depth 4. info, if given, is called
+        as info(depth, score, nodes, pv) after every completed iteration.
+        played lists the hashes of the game's positions before this one, so
+        returning to any of them is scored as a draw.
+        Returns the best move found, or 0 if there are no legal moves.
+        """
+        if time_limit is None and depth is None and nodes is None:
+            depth = 4
+        max_depth = min(depth or MAX_PLY - 1, MAX_PLY - 1)
+
+        # search a private copy so the caller's board is never touched
+        self.board = board.copy()
+        self.start = time.perf_counter()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.node_limit = nodes
+        self.nodes = 0
+        self.stopped = False
+        # positions since the last capture or pawn move can still repeat
+        self.path = list(played[-board.halfmove:]) if board.halfmove else []
+        self.tt.new_search()
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        for i in range(4096):
+            self.history[i] >>= 2
+
+        # forget the last search's results, also when there is no move
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        moves = legal_moves(self.board, self.board.side)
+        if not moves:
+            return 0
+        best = moves[0]
+        self.pv = [best]
+
+        for current_depth in range(1, max_depth + 1):
+            self.root_best = 0
+            score = self.negamax(current_depth, -INFINITY, INFINITY, 0)
+            # a partial iteration still improves on the last one if it
+            # finished searching the previous best move
+            if self.root_best:
+                best = self.root_best
+            if self.stopped:
+                break
+            self.depth = current_depth
+            self.score = score
+            self.pv = self.principal_variation(current_depth)
+            if info is not None:
+                info(current_depth, score, self.nodes, self.pv)
+            # a forced mate has been found, searching deeper cannot help
+            if abs(score) >= MATE_BOUND:
+                break
+            # not enough time left to finish another iteration
+            if self.deadline is not None and \
+                    time.perf_counter() - self.start > (self.deadline - self.start) / 2:
+                break
+        return best
+
+    def _check_limits(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        elif self.abort is not None and self.abort():
+            self.stopped = True
+
+    def _order(self, moves, hash_move, ply):
+        squares = self.board.squares
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history
+        keys = {}
+        for move in moves:
+            if move == hash_move:
+                keys[move] = _HASH_MOVE
+                continue
+            tactical = _tactical_score(squares, move)
+            if tactical is not None:
+                keys[move] = _CAPTURE + tactical
+            elif move == killer_1:
+                keys[move] = _KILLER_1
+            elif move == killer_2:
+                keys[move] = _KILLER_2
+            else:
+                keys[move] = history[move & 4095]
+        moves.sort(key=keys.__getitem__, reverse=True)
+        return moves
+
+    def negamax(self, depth, alpha, beta, ply):
+        board = self.board
+        self.nodes += 1
+        if self.nodes % _CHECK_INTERVAL == 0:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        key = board.hash
+        # a position repeated on the current line is scored as a draw
+        if ply and key in self.path:
+            return 0
+
+        checked = in_check(board, board.side)
+        # look one ply further when in check
+        if checked:
+            depth += 1
+        if depth <= 0:
+            return self.quiesce(alpha, beta, ply)
+
+        hash_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            entry_depth, score, bound, hash_move = entry
+            if ply and entry_depth >= depth:
+                if score >= MATE_BOUND:
+                    score -= ply
+                elif score <= -MATE_BOUND:
+                    score += ply
+                if bound == BOUND_EXACT:
+                    return score
+                if bound == BOUND_LOWER and score >= beta:
+                    return score
+                if bound == BOUND_UPPER and score <= alpha:
+                    return score
+
+        moves = legal_moves(board, board.side)
+        if not moves:
+            # checkmate or stalemate
+            return -MATE + ply if checked else 0
+        if ply >= MAX_PLY - 1:
+            return evaluate(board)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        squares = board.squares
+        self.path.append(key)
+        for move in self._order(moves, hash_move, ply):
+            quiet = _tactical_score(squares, move) is None
+            undo = board.make_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move(move, undo)
+            if self.stopped:
+                break
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_best = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if quiet:
+                            killers = self.killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self.history[move & 4095] += depth * depth
+                        break
+        self.path.pop()
+        if self.stopped:
+            return 0
+
+        if best_score >= beta:
+            bound = BOUND_LOWER
+        elif best_score > original_alpha:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        stored = best_score
+        if stored >= MATE_BOUND:
+            stored += ply
+        elif stored <= -MATE_BOUND:
+            stored -= ply
+        self.tt.store(key, depth, stored, bound, best_move)
+        return best_score
+
+    def quiesce(self, alpha, beta, ply):
+        board = self.board
+        self.nodes += 1
+        if self.nodes % _CHECK_INTERVAL == 0:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        # the side to move can usually do at least as well as standing pat
+        stand_pat = evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        # captures and queen promotions, best first
+        squares = board.squares
+        keys = {}
+        for move in legal_moves(board, board.side):
+            if move & MOVE_KIND_MASK == PROMOTION and move_promotion(move) != QUEEN:
+                continue
+            tactical = _tactical_score(squares, move)
+            if tactical is not None:
+                keys[move] = tactical
+        captures = sorted(keys, key=keys.__getitem__, reverse=True)
+        for move in captures:
+            undo = board.make_move(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            board.unmake_move(move, undo)
+            if self.stopped:
+                return 0
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def principal_variation(self, depth):
+        # follow best moves through the transposition table
+        board = self.board.copy()
+        pv = []
+        seen = set()
+        while len(pv) < depth and board.hash not in seen:
+            seen.add(board.hash)
+            entry = self.tt.probe(board.hash)
+            if entry is None or entry[3] not in legal_moves(board, board.side):
+                break
+            pv.append(entry[3])
+            board.make_move(entry[3])
+        return pv
+
+
+def pv_string(pv):
+    return " ".join(move_name(move) for move in pv)
@@ -0,0 +1,192 @@
+"""Headless self-play runner.
+
+Plays many games in parallel worker processes and streams one JSON line
+per finished game to the output file.
+
+    python selfplay.py --games 100 --mode mixed --output games.jsonl
+    python selfplay.py --games 8 --mode engine --nodes 5000 --position RNBQKBNR
+    python selfplay.py --games 100 --output games.jsonl --pgn games.pgn
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rules import Rules
+from chess960 import random_position_id, parse_position, decode, encode, back_rank_to_string
+from movegen import move_name
+from search import Search
+from pgn import RESULTS
+
+# engines shared by all games played in one worker process, by table size
+_engines = {}
+
+
+def _get_engine(hash_mb):
+    if hash_mb not in _engines:
+        _engines[hash_mb] = Search(hash_mb)
+    return _engines[hash_mb]
+
+
+def play_game(task):
+    """Play one game described by a task dict and return its result record
+
+    task keys: game, position_id, white, black ("random" or "engine"),
+    seed, nodes, time, max_plies, hash_mb, pgn (include the game as PGN)
+    """
+    rng = random.Random(task["seed"])
+    players = {"white": task["white"], "black": task["black"]}
+    engine = None
+    if "engine" in players.values():
+        engine = _get_engine(task["hash_mb"])
+        engine.tt.clear()
+
+    rules = Rules()
+    rules.reset(position_id=task["position_id"])
+    moves = []
+    nodes = 0
+    termination = "move limit"
+    start = time.perf_counter()
+    while len(moves) < task["max_plies"]:
+        result = rules.check_game_end()
+        if result:
+            termination = result
+            break
+        if players["white" if rules.turn["white"] else "black"] == "engine":
+            move = engine.best_move(rules, time_limit=task["time"], nodes=task["nodes"])
+            nodes += engine.nodes
+        else:
+            move = rng.choice(rules.legal_moves())
+        moves.append(move_name(move))
+        rules.make_move(move)
+        if rules.winner:
+            termination = "king capture"
+            break
+
+    record = {
+        "game": task["game"],
+        "position_id": task["position_id"],
+        "start": back_rank_to_string(decode(task["position_id"])),
+        "white": task["white"],
+        "black": task["black"],
+        "moves": moves,
+        "result": RESULTS[rules.winner],
+        "termination": termination,
+        "plies": len(moves),
+        "nodes": nodes,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    if task.get("pgn"):
+        record["pgn"] = rules.pgn({
+            "Event": "Self-play", "Round": task["game"] + 1,
+            "White": task["white"], "Black": task["black"], "Termination": termination})
+    return record
+
+
+def make_tasks(games, mode, position=None, seed=None, nodes=None, time_limit=None,
+               max_plies=300, hash_mb=8, pgn=False):
+    """Task dicts for play_game, one per game"""
+    rng = random.Random(seed)
+    tasks = []
+    for game in range(games):
+        if mode == "random":
+            white, black = "random", "random"
+        elif mode == "engine":
+            white, black = "engine", "engine"
+        else:
+            # engine against random mover, swapping colors every game
+            white, black = ("engine", "random") if game % 2 == 0 else ("random", "engine")
+        if position is None:
+            position_id = random_position_id(rng)
+        else:
+            position_id = position
+        tasks.append({
+            "game": game,
+            "position_id": position_id,
+            "white": white,
+            "black": black,
+            "seed": rng.getrandbits(32),
+            "nodes": nodes,
+            "time": time_limit,
+            "max_plies": max_plies,
+            "hash_mb": hash_mb,
+            "pgn": pgn,
+        })
+    return tasks
+
+
+def run(tasks, output, workers=None, pgn_output=None):
+    """Play tasks across worker processes, writing each result as it ends
+
+    Games played with the pgn task flag are also appended to pgn_output.
+    Returns a Counter of game results.
+    """
+    results = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, task) for task in tasks]
+        for future in as_completed(futures):
+            record = future.result()
+            pgn = record.pop("pgn", None)
+            if pgn is not None and pgn_output is not None:
+                pgn_output.write(pgn + "\n")
+                pgn_output.flush()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            results[record["result"]] += 1
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play headless games in parallel")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--mode", choices=["random", "engine", "mixed"], default="mixed",
+                        help="random movers, engine against engine, or engine against random")
+    parser.add_argument("--position", help="Chess960 back rank or position number 0-959 "
+                                           "for every game (default: a random start per game)")
+    parser.add_argument("--seed", type=int, help="seed for start positions and random movers")
+    parser.add_argument("--nodes", type=int, default=2000, help="engine node budget per move")
+    parser.add_argument("--time", type=float, help="engine time budget per move in seconds")
+    parser.add_argument("--max-plies", type=int, default=300,
+                        help="stop a game after this many plies")
+    parser.add_argument("--hash", type=int, default=8,
+                        help="transposition table size per worker in MB")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--output", default="-", help="JSON lines output file (default: stdout)")
+    parser.add_argument("--pgn", help="also append every game to this PGN file")
+    args = parser.parse_args(argv)
+
+    position = None
+    if args.position:
+        try:
+            position = encode(parse_position(args.position))
+        except ValueError as e:
+            parser.error(str(e))
+
+    tasks = make_tasks(args.games, args.mode, position, args.seed, args.nodes,
+                       args.time, args.max_plies, args.hash, args.pgn is not None)
+    start = time.perf_counter()
+    pgn_output = open(args.pgn, "a") if args.pgn else None
+    try:
+        if args.output == "-":
+            results = run(tasks, sys.stdout, args.workers, pgn_output)
+        else:
+            with open(args.output, "w") as output:
+                results = run(tasks, output, args.workers, pgn_output)
+    finally:
+        if pgn_output is not None:
+            pgn_output.close()
+    elapsed = time.perf_counter() - start
+
+    print("{} games in {:.1f}s ({:.2f} games/s) {}".format(
+        args.games, elapsed, args.games / max(elapsed, 1e-9), dict(results)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
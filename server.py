@@ -0,0 +1,700 @@
+"""Asyncio Chess960 game server speaking JSON lines over TCP.
+
+One process hosts any number of games over the headless Rules core. A
+client sends one JSON object per line:
+
+    {"op": "new", "position": 518, "clock": [300, 2], "color": "white"}
+    {"op": "join", "game": 7, "color": "black"}    a free seat, or watch
+    {"op": "move", "game": 7, "move": "e2e4"}      coordinates or SAN
+    {"op": "resign", "game": 7}
+    {"op": "state", "game": 7}
+    {"op": "leave", "game": 7}
+
+and gets JSON lines back: "joined" when it takes a seat, "state" with the
+FEN, last move, clocks and result whenever a game it is in changes, and
+"error" for requests that cannot be played. A game is dropped as soon as
+nobody is connected to it, and a client leaving more than MAX_BUFFER bytes
+of replies unread is disconnected, so memory is bounded by the games in use.
+
+    python server.py --port 8960
+    python server.py --bench 2000      # in-process clients, reports moves/s
+    python server.py --check           # scripted games, exits non-zero on a failure
+
+ServerClient is the blocking client used by the game window (main.py
+--connect), reading replies in a background thread.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+from board import QUEEN, KING, WHITE, BLACK, COLOR_NAMES
+from bitboard import popcount
+from chess960 import parse_position, encode, STANDARD as STANDARD_ID
+from movegen import in_check, move_name
+from pgn import SAN_TYPES, RESULTS, parse_san
+from rules import Rules
+
+DEFAULT_PORT = 8960
+# longest request line accepted, in bytes
+MAX_LINE = 4096
+# replies a client may leave unread, in bytes, before it is disconnected
+MAX_BUFFER = 256 * 1024
+COLORS = ("white", "black")
+# longest clock time and increment a game can be given, in seconds
+MAX_CLOCK = 24 * 3600
+# winner names used by Rules, by PGN result
+WINNERS = {result: winner for winner, result in RESULTS.items()}
+
+
+def _square(name):
+    # square index of a name such as "e4", or None
+    if len(name) == 2 and "a" <= name[0] <= "h" and "1" <= name[1] <= "8":
+        return (ord(name[0]) - 97) | (ord(name[1]) - 49) << 3
+    return None
+
+
+def check_position(board):
+    """Raise ValueError unless a Board can be played from
+
+    Each side needs exactly one king, and the side not to move must not be
+    in check, or its king could be captured.
+    """
+    for color in (WHITE, BLACK):
+        if popcount(board.bitboards[color | KING]) != 1:
+            raise ValueError("each side needs exactly one king")
+    if in_check(board, board.side ^ BLACK):
+        raise ValueError("the side not to move is in check")
+
+
+def parse_move(rules, text):
+    """Legal move of a Rules position from coordinates or SAN
+
+    Coordinates are "e2e4", "e7e8n" or, for castling, the king moving to
+    its rook or to its castling square. Raises ValueError if the move is
+    malformed or illegal.
+    """
+    src, des = _square(text[:2]), _square(text[2:4])
+    if src is not None and des is not None and len(text) <= 5:
+        promotion = QUEEN
+        if len(text) == 5:
+            promotion = SAN_TYPES.get(text[4].upper())
+            if promotion is None or promotion == SAN_TYPES["K"]:
+                raise ValueError("malformed move {!r}".format(text))
+        move = rules.find_move(src, des, promotion)
+        if move is None:
+            raise ValueError("illegal move {!r}".format(text))
+        return move
+    return parse_san(rules.board, text, rules.legal_moves())
+
+
+class Connection(object):
+    __slots__ = ("writer", "games")
+
+    def __init__(self, writer):
+        self.writer = writer
+        # ids of the games this connection sits at or watches
+        self.games = set()
+
+    def send(self, message):
+        if self.writer.is_closing():
+            return
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() > MAX_BUFFER:
+            # not reading its replies; handle() sees the connection end and
+            # takes it out of its games
+            transport.abort()
+            return
+        self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+class ServerGame(object):
+    """A hosted game: the position, who is connected and the clocks"""
+
+    __slots__ = ("id", "rules", "seats", "watchers", "clock", "increment",
+                 "turn_started", "timer", "termination")
+
+    def __init__(self, game_id, rules, clock=None, increment=0.0):
+        self.id = game_id
+        self.rules = rules
+        # connection in each seat, and connections watching
+        self.seats = {"white": None, "black": None}
+        self.watchers = set()
+        # seconds left per color, None for games without a clock
+        self.clock = None if clock is None else {"white": float(clock), "black": float(clock)}
+        self.increment = float(increment)
+        # loop time the running clock was started, and the timer that
+        # flags the player to move when it runs out
+        self.turn_started = None
+        self.timer = None
+        # how the game ended, None while it is going on
+        self.termination = None
+
+    def connections(self):
+        connections = set(self.watchers)
+        connections.update(conn for conn in self.seats.values() if conn is not None)
+        return connections
+
+    @property
+    def turn(self):
+        return COLOR_NAMES[self.rules.side]
+
+    def time_left(self, color, now):
+        # seconds left on a color's clock, counting the running turn
+        left = self.clock[color]
+        if self.turn_started is not None and color == self.turn:
+            left -= now - self.turn_started
+        return max(left, 0.0)
+
+    def state(self, now):
+        rules = self.rules
+        return {
+            "event": "state",
+            "game": self.id,
+            "fen": rules.fen(),
+            "ply": rules.ply,
+            "last": move_name(rules.history[-1].move) if rules.history else None,
+            "turn": self.turn,
+            "result": RESULTS[rules.winner],
+            "termination": self.termination,
+            "clock": None if self.clock is None else
+            {color: round(self.time_left(color, now), 3) for color in COLORS},
+            "running": self.turn if self.turn_started is not None else None,
+            "players": {color: self.seats[color] is not None for color in COLORS},
+        }
+
+
+class GameServer(object):
+    def __init__(self):
+        # hosted games by id
+        self.games = {}
+        self._ids = itertools.count(1)
+        # moves validated and played since start
+        self.moves = 0
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Start listening; returns the asyncio Server"""
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+    async def handle(self, reader, writer):
+        # one client connection, a request per line
+        conn = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    conn.send({"event": "error", "message": "request line too long"})
+                    break
+                if not line:
+                    break
+                self.request(conn, line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in list(conn.games):
+                self.leave(conn, game_id)
+            writer.close()
+
+    def request(self, conn, line):
+        """Handle one request line, answering errors to the connection"""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            handler = getattr(self, "op_" + str(request.get("op")), None)
+            if handler is None:
+                raise ValueError("unknown op {!r}".format(request.get("op")))
+            handler(conn, request)
+        except ValueError as e:
+            conn.send({"event": "error", "message": str(e)})
+        except RecursionError:
+            # json.loads recurses once per nested array or object
+            conn.send({"event": "error", "message": "request nested too deeply"})
+
+    def game(self, request):
+        try:
+            return self.games[request["game"]]
+        except (KeyError, TypeError):
+            raise ValueError("no game {!r}".format(request.get("game")))
+
+    def broadcast(self, game):
+        state = game.state(asyncio.get_running_loop().time())
+        for conn in game.connections():
+            conn.send(state)
+
+    def op_new(self, conn, request):
+        # check everything before the game exists, so a bad request leaves
+        # no game behind
+        color = request.get("color", "white")
+        if color is not None and color not in COLORS:
+            raise ValueError("color must be white or black")
+        clock = request.get("clock")
+        if clock is not None:
+            if (not isinstance(clock, list) or len(clock) != 2
+                    or not all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                               and math.isfinite(value) for value in clock)
+                    or not 0 < clock[0] <= MAX_CLOCK or not 0 <= clock[1] <= MAX_CLOCK):
+                raise ValueError("clock must be [seconds, increment], at most {} each".format(
+                    MAX_CLOCK))
+        rules = Rules()
+        if request.get("fen"):
+            rules.load_fen(str(request["fen"]))
+            check_position(rules.board)
+        else:
+            position = request.get("position")
+            if position is not None:
+                position = encode(parse_position(str(position)))
+            rules.reset(position_id=position)
+        if clock is not None:
+            game = ServerGame(next(self._ids), rules, clock[0], clock[1])
+        else:
+            game = ServerGame(next(self._ids), rules)
+        self.games[game.id] = game
+        request = dict(request, game=game.id, color=color)
+        self.op_join(conn, request)
+
+    def op_join(self, conn, request):
+        game = self.game(request)
+        color = request.get("color")
+        if color is None:
+            # the first free seat, or watch
+            color = next((color for color in COLORS if game.seats[color] is None), None)
+        elif color not in COLORS:
+            raise ValueError("color must be white or black")
+        elif game.seats[color] not in (None, conn):
+            raise ValueError("{} is already taken in game {}".format(color, game.id))
+        if color is None:
+            game.watchers.add(conn)
+        else:
+            game.seats[color] = conn
+        conn.games.add(game.id)
+        conn.send({"event": "joined", "game": game.id, "color": color})
+        # the clock starts once both players are seated
+        if (game.clock is not None and game.turn_started is None and game.termination is None
+                and game.seats["white"] is not None and game.seats["black"] is not None):
+            self._start_clock(game)
+        self.broadcast(game)
+
+    def op_move(self, conn, request):
+        game = self.game(request)
+        if game.termination is not None:
+            raise ValueError("game {} is over".format(game.id))
+        color = game.turn
+        if game.seats[color] is not conn:
+            raise ValueError("it is not your turn in game {}".format(game.id))
+        move = parse_move(game.rules, str(request.get("move", "")))
+
+        if game.clock is not None and game.turn_started is not None:
+            loop = asyncio.get_running_loop()
+            game.clock[color] = game.time_left(color, loop.time())
+            if game.clock[color] <= 0:
+                self._end(game, "White" if color == "black" else "Black", "time forfeit")
+                self.broadcast(game)
+                return
+            game.clock[color] += game.increment
+        game.rules.make_move(move)
+        self.moves += 1
+        result = game.rules.check_game_end()
+        if result is not None:
+            self._end(game, game.rules.winner, result)
+        elif game.turn_started is not None:
+            self._start_clock(game)
+        self.broadcast(game)
+
+    def op_resign(self, conn, request):
+        game = self.game(request)
+        color = next((color for color in COLORS if game.seats[color] is conn), None)
+        if color is None:
+            raise ValueError("you are not playing game {}".format(game.id))
+        if game.termination is not None:
+            raise ValueError("game {} is over".format(game.id))
+        self._end(game, "Black" if color == "white" else "White", "resignation")
+        self.broadcast(game)
+
+    def op_state(self, conn, request):
+        game = self.game(request)
+        conn.send(game.state(asyncio.get_running_loop().time()))
+
+    def op_leave(self, conn, request):
+        self.leave(conn, self.game(request).id)
+
+    def leave(self, conn, game_id):
+        conn.games.discard(game_id)
+        game = self.games.get(game_id)
+        if game is None:
+            return
+        game.watchers.discard(conn)
+        for color in COLORS:
+            if game.seats[color] is conn:
+                game.seats[color] = None
+        if game.connections():
+            self.broadcast(game)
+        else:
+            # nobody left to play or watch
+            if game.timer is not None:
+                game.timer.cancel()
+            del self.games[game_id]
+
+    def _start_clock(self, game):
+        # run the clock of the side to move, flagging it when it runs out
+        loop = asyncio.get_running_loop()
+        if game.timer is not None:
+            game.timer.cancel()
+        game.turn_started = loop.time()
+        game.timer = loop.call_later(game.clock[game.turn], self._flag, game)
+
+    def _flag(self, game):
+        game.timer = None
+        if game.termination is not None or self.games.get(game.id) is not game:
+            return
+        color = game.turn
+        left = game.time_left(color, asyncio.get_running_loop().time())
+        if left > 0:
+            # woken a little early
+            game.timer = asyncio.get_running_loop().call_later(left, self._flag, game)
+            return
+        self._end(game, "White" if color == "black" else "Black", "time forfeit")
+        self.broadcast(game)
+
+    def _end(self, game, winner, termination):
+        # stop the clocks and record the result
+        if game.turn_started is not None:
+            now = asyncio.get_running_loop().time()
+            game.clock[game.turn] = game.time_left(game.turn, now)
+            game.turn_started = None
+        if game.timer is not None:
+            game.timer.cancel()
+            game.timer = None
+        game.rules.winner = winner
+        game.termination = termination
+
+
+class ServerClient(object):
+    """Blocking client for one server connection
+
+    Replies are read in a background thread and queued for poll();
+    `notify`, if given, is called from that thread after every reply so a
+    waiting event loop can wake up.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, notify=None):
+        self.sock = socket.create_connection((host, port))
+        self.notify = notify
+        self.replies = queue.Queue()
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        try:
+            with self.sock.makefile("rb") as lines:
+                for line in lines:
+                    self.replies.put(json.loads(line))
+                    if self.notify is not None:
+                        self.notify()
+        except (OSError, ValueError):
+            pass
+        self.replies.put({"event": "closed"})
+        if self.notify is not None:
+            self.notify()
+
+    def send(self, op, **fields):
+        fields["op"] = op
+        data = json.dumps(fields).encode() + b"\n"
+        with self._lock:
+            self.sock.sendall(data)
+
+    def poll(self):
+        """Replies received since the last call"""
+        replies = []
+        while True:
+            try:
+                replies.append(self.replies.get_nowait())
+            except queue.Empty:
+                return replies
+
+    def close(self):
+        # nothing is notified once the caller is done with the connection
+        self.notify = None
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+async def _bench_client(port, games, rng, max_plies):
+    # play random games against itself, sitting in both seats
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 16)
+
+    async def reply():
+        while True:
+            message = json.loads(await reader.readline())
+            if message["event"] == "state":
+                return message
+            if message["event"] == "error":
+                raise RuntimeError(message["message"])
+
+    moves = 0
+    for game in range(games):
+        writer.write(json.dumps({"op": "new", "position": rng.randrange(960)}).encode() + b"\n")
+        state = await reply()
+        game_id = state["game"]
+        writer.write(json.dumps({"op": "join", "game": game_id, "color": "black"}).encode() + b"\n")
+        state = await reply()
+        # a local copy of the game to pick legal moves from
+        rules = Rules()
+        rules.load_fen(state["fen"])
+        while state["result"] == "*" and state["ply"] < max_plies:
+            move = rng.choice(rules.legal_moves())
+            rules.make_move(move)
+            writer.write(json.dumps({"op": "move", "game": game_id,
+                                     "move": move_name(move)}).encode() + b"\n")
+            state = await reply()
+            moves += 1
+        writer.write(json.dumps({"op": "leave", "game": game_id}).encode() + b"\n")
+    writer.close()
+    return moves
+
+
+async def bench(games, clients=50, max_plies=200, seed=None):
+    """Play random games through in-process clients over TCP
+
+    Returns (moves played, seconds, bytes per idle game).
+    """
+    server = GameServer()
+    listener = await server.serve("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    counts = [games // clients + (i < games % clients) for i in range(clients)]
+    moves = sum(await asyncio.gather(*[
+        _bench_client(port, count, random.Random(rng.getrandbits(32)), max_plies)
+        for count in counts if count]))
+    elapsed = time.perf_counter() - start
+
+    # memory held by a game waiting for its second player
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    idle = [ServerGame(i, Rules(), 300, 2) for i in range(1000)]
+    per_game = (tracemalloc.get_traced_memory()[0] - before) // len(idle)
+    tracemalloc.stop()
+
+    listener.close()
+    await listener.wait_closed()
+    return moves, elapsed, per_game
+
+
+class _CheckClient(object):
+    """In-process client for the behaviour checks, talking asyncio streams"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, op, **fields):
+        fields["op"] = op
+        self.writer.write(json.dumps(fields).encode() + b"\n")
+
+    async def replies(self, settle=0.1):
+        # everything the server sends until it has been quiet for `settle`
+        # seconds, waiting up to two seconds for the first reply
+        replies = []
+        timeout = 2.0
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                return replies
+            if not line:
+                replies.append({"event": "closed"})
+                return replies
+            replies.append(json.loads(line))
+            timeout = settle
+
+    def close(self):
+        self.writer.close()
+
+
+def _expect(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def _events(replies):
+    return [reply["event"] for reply in replies]
+
+
+async def _connect(port):
+    return _CheckClient(*await asyncio.open_connection("127.0.0.1", port))
+
+
+async def _seat(port, **new):
+    # a new game with a client in each seat, both past their join replies
+    white, black = await _connect(port), await _connect(port)
+    white.send("new", position=STANDARD_ID, **new)
+    game_id = (await white.replies())[0]["game"]
+    black.send("join", game=game_id, color="black")
+    await black.replies()
+    await white.replies()
+    return white, black, game_id
+
+
+async def _check_bad_requests(server, port):
+    client = await _connect(port)
+    for request in ({"color": "purple"}, {"clock": [float("nan"), 0]}, {"clock": [True, 0]},
+                    {"clock": [MAX_CLOCK + 1, 0]}, {"fen": "8/8/8/8/8/8/8/8 w - - 0 1"},
+                    {"fen": "4k3/8/8/8/8/8/8/4R2K w - - 0 1"}):
+        client.send("new", **request)
+        replies = await client.replies()
+        _expect(_events(replies) == ["error"], "new {} answered {}".format(request, replies))
+    client.writer.write(b"[" * (MAX_LINE - 2) + b"\n")
+    client.send("nonsense")
+    replies = await client.replies()
+    _expect(_events(replies) == ["error", "error"], "bad lines answered {}".format(replies))
+    _expect(not server.games, "rejected requests left games {}".format(list(server.games)))
+    client.close()
+
+
+async def _check_moves(server, port):
+    white, black, game_id = await _seat(port)
+    watcher = await _connect(port)
+    watcher.send("join", game=game_id)
+    _expect((await watcher.replies())[0]["color"] is None, "a third client took a seat")
+    await white.replies()
+    await black.replies()
+
+    # out of turn, illegal, and from a watcher
+    for client, move in ((black, "e7e5"), (white, "e2e5"), (white, "Nb3"), (watcher, "e2e4")):
+        client.send("move", game=game_id, move=move)
+        replies = await client.replies()
+        _expect(_events(replies) == ["error"], "{} answered {}".format(move, replies))
+    _expect(server.games[game_id].rules.ply == 0, "a rejected move was played")
+
+    # coordinates and SAN, seen by everyone in the game
+    white.send("move", game=game_id, move="e2e4")
+    for client in (white, black, watcher):
+        state = (await client.replies())[-1]
+        _expect(state["ply"] == 1 and state["last"] == "e2e4", "e2e4 gave {}".format(state))
+    black.send("move", game=game_id, move="e5")
+    state = (await white.replies())[-1]
+    _expect(state["ply"] == 2 and state["last"] == "e7e5", "e5 gave {}".format(state))
+    for client in (white, black, watcher):
+        client.close()
+
+
+async def _check_clock(server, port):
+    white, black, game_id = await _seat(port, clock=[0.3, 0])
+    await asyncio.sleep(0.5)
+    state = (await white.replies())[-1]
+    _expect(state["result"] == "0-1" and state["termination"] == "time forfeit",
+            "the clock ran out into {}".format(state))
+    await black.replies()
+    white.send("move", game=game_id, move="e2e4")
+    _expect(_events(await white.replies()) == ["error"], "a move was taken after the flag")
+    white.close()
+    black.close()
+
+
+async def _check_resign(server, port):
+    white, black, game_id = await _seat(port)
+    black.send("resign", game=game_id)
+    state = (await white.replies())[-1]
+    _expect(state["result"] == "1-0" and state["termination"] == "resignation",
+            "resigning gave {}".format(state))
+    await black.replies()
+    white.send("move", game=game_id, move="e2e4")
+    _expect(_events(await white.replies()) == ["error"], "a move was taken after resigning")
+    white.close()
+    black.close()
+
+
+async def _check_leave(server, port):
+    white, black, game_id = await _seat(port)
+    white.send("leave", game=game_id)
+    await black.replies()
+    _expect(game_id in server.games, "the game was dropped with black still in it")
+    black.send("leave", game=game_id)
+    await black.replies()
+    _expect(game_id not in server.games, "the game outlived its last player")
+
+    white.close()
+    black.close()
+
+    # a connection going away leaves its games as well
+    white, black, game_id = await _seat(port, clock=[60, 0])
+    white.close()
+    black.close()
+    await asyncio.sleep(0.1)
+    _expect(game_id not in server.games, "the game outlived its closed connections")
+
+
+async def run_checks():
+    """Play scripted games through in-process clients; True if all pass"""
+    server = GameServer()
+    listener = await server.serve("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    passed = True
+    for check in (_check_bad_requests, _check_moves, _check_clock, _check_resign,
+                  _check_leave):
+        try:
+            await check(server, port)
+            status = "ok"
+        except AssertionError as e:
+            passed = False
+            status = "FAIL ({})".format(e)
+        print("{}: {}".format(check.__name__[len("_check_"):].replace("_", " "), status))
+    listener.close()
+    await listener.wait_closed()
+    return passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host Chess960 games over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bench", type=int, metavar="GAMES",
+                        help="play this many random games through in-process clients and exit")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent clients for --bench")
+    parser.add_argument("--check", action="store_true",
+                        help="run scripted games against an in-process server and exit "
+                             "non-zero on a failure")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    if args.check:
+        return 0 if asyncio.run(run_checks()) else 1
+    if args.bench:
+        moves, elapsed, per_game = asyncio.run(bench(args.bench, max(args.clients, 1),
+                                                     seed=args.seed))
+        print("{} games, {} moves in {:.1f}s ({:.0f} moves/s), {:.1f} KB per idle game".format(
+            args.bench, moves, elapsed, moves / max(elapsed, 1e-9), per_game / 1024.0))
+        return 0
+
+    async def serve():
+        server = GameServer()
+        listener = await server.serve(args.host, args.port)
+        print("serving on {}:{}".format(args.host, args.port), file=sys.stderr)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""Compact binary storage for positions and games.
+
+A position is packed into 32 bytes:
+
+    offset  size  field
+         0     8  occupied      bitboard of occupied squares (little-endian)
+         8    16  pieces        piece codes of the occupied squares from a1 to
+                                h8, one per nibble, low nibble first
+        24     2  castle_rooks  rook file (3 bits) of each castling right,
+                                white kingside first
+        26     1  castling      castling rights bits as in board.py
+        27     1  side          0 = white to move, 1 = black
+        28     1  ep            en passant square, 255 if none
+        29     1  halfmove      halfmove clock, capped at 255
+        30     2  fullmove      move number
+
+A position file is a 16 byte header followed by packed positions. A game
+file holds one 48 byte record per game (start position, offset and number
+of its moves, result) and keeps the moves themselves, two bytes each, in a
+companion file with the same name plus ".moves".
+
+Files are written in a streaming way with pure python. Reading them with
+open_positions() / open_games() memory-maps them as NumPy structured
+arrays without copying, so datasets are scanned at disk speed:
+
+    positions = open_positions("train.pos")
+    planes = piece_planes(positions[:4096])
+
+    python storage.py pack-fens positions.fen positions.pos
+    python storage.py pack-pgn archive.pgn archive.games
+    python storage.py info archive.games
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+from board import (Board, WHITE, BLACK, WHITE_KINGSIDE, WHITE_QUEENSIDE,
+                   BLACK_KINGSIDE, BLACK_QUEENSIDE)
+
+POSITION_SIZE = 32
+GAME_SIZE = 48
+MOVE_SIZE = 2
+HEADER_SIZE = 16
+VERSION = 1
+
+POSITION_MAGIC = b"FSCPOS\r\n"
+GAME_MAGIC = b"FSCGAM\r\n"
+MOVES_SUFFIX = ".moves"
+
+# game results, with the winner names used by Rules
+RESULT_CODES = {"": 0, "White": 1, "Black": 2, "Draw": 3}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+
+# no en passant square
+NO_EP = 255
+
+_RIGHTS = (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE)
+
+_POSITION = struct.Struct("<Q16sHBBBBH")
+_GAME = struct.Struct("<32sQHB5x")
+_HEADER = struct.Struct("<8sII")
+
+
+def pack_position(board):
+    """32 byte encoding of a board"""
+    occupied = board.bitboards[WHITE] | board.bitboards[BLACK]
+    codes = [piece for piece in board.squares if piece]
+    if len(codes) > 32:
+        raise ValueError("cannot pack a position with more than 32 pieces")
+    if len(codes) & 1:
+        codes.append(0)
+    pieces = bytes(codes[i] | codes[i + 1] << 4 for i in range(0, len(codes), 2))
+
+    castle_rooks = 0
+    for i, right in enumerate(_RIGHTS):
+        if board.castling & right:
+            castle_rooks |= (board.castle_rooks[right] & 7) << (3 * i)
+    return _POSITION.pack(occupied, pieces, castle_rooks, board.castling,
+                          board.side >> 3, NO_EP if board.ep is None else board.ep,
+                          min(board.halfmove, 255), min(board.fullmove, 0xFFFF))
+
+
+def unpack_position(data, board=None):
+    """Board for a 32 byte encoding; fills `board` in place if given"""
+    occupied, pieces, castle_rooks, castling, side, ep, halfmove, fullmove = \
+        _POSITION.unpack(data)
+    if board is None:
+        board = Board()
+    else:
+        board.clear()
+    i = 0
+    while occupied:
+        sq = (occupied & -occupied).bit_length() - 1
+        occupied &= occupied - 1
+        code = pieces[i >> 1]
+        board.put_piece(sq, code >> 4 if i & 1 else code & 15)
+        i += 1
+
+    if side:
+        board.set_side(BLACK)
+    if castling:
+        rooks = {}
+        for i, right in enumerate(_RIGHTS):
+            if castling & right:
+                back = 0 if right in (WHITE_KINGSIDE, WHITE_QUEENSIDE) else 56
+                rooks[right] = back + ((castle_rooks >> (3 * i)) & 7)
+        board.set_castling(castling, rooks)
+    if ep != NO_EP:
+        board.set_ep(ep)
+    board.halfmove = halfmove
+    board.fullmove = fullmove
+    return board
+
+
+def _write_header(f, magic, record_size):
+    f.write(_HEADER.pack(magic, VERSION, record_size))
+
+
+def _check_header(f, magic, record_size, path):
+    header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE:
+        raise ValueError("{}: file is too short".format(path))
+    found, version, size = _HEADER.unpack(header)
+    if found != magic or version != VERSION or size != record_size:
+        raise ValueError("{}: not a version {} {} file".format(
+            path, VERSION, "position" if magic == POSITION_MAGIC else "game"))
+
+
+def _open_for_append(path, magic, record_size):
+    # open a file for appending records, writing the header if it is new
+    f = open(path, "ab")
+    if f.tell() == 0:
+        _write_header(f, magic, record_size)
+    else:
+        with open(path, "rb") as existing:
+            _check_header(existing, magic, record_size, path)
+    return f
+
+
+def write_positions(path, boards, append=False):
+    """Write packed boards to a position file; returns how many were written"""
+    if not append and os.path.exists(path):
+        os.remove(path)
+    count = 0
+    with _open_for_append(path, POSITION_MAGIC, POSITION_SIZE) as f:
+        for board in boards:
+            f.write(pack_position(board))
+            count += 1
+    return count
+
+
+def read_positions(path, reuse=False):
+    """Generate the boards of a position file without NumPy
+
+    With `reuse` set the same board object is refilled for every record.
+    """
+    board = Board() if reuse else None
+    with open(path, "rb") as f:
+        _check_header(f, POSITION_MAGIC, POSITION_SIZE, path)
+        while True:
+            data = f.read(POSITION_SIZE)
+            if len(data) < POSITION_SIZE:
+                break
+            yield unpack_position(data, board)
+
+
+class GameWriter(object):
+    """Appends games to a game file and its moves file
+
+        with GameWriter("archive.games") as writer:
+            writer.write(parse_fen(rules.start_fen), rules.move_list, rules.winner)
+    """
+
+    def __init__(self, path, append=False):
+        moves_path = path + MOVES_SUFFIX
+        if not append:
+            for p in (path, moves_path):
+                if os.path.exists(p):
+                    os.remove(p)
+        self.games = _open_for_append(path, GAME_MAGIC, GAME_SIZE)
+        self.moves = _open_for_append(moves_path, GAME_MAGIC, MOVE_SIZE)
+        # index of the next move in the moves file
+        self.offset = (self.moves.tell() - HEADER_SIZE) // MOVE_SIZE
+
+    def write(self, start, moves, winner=""):
+        """Store a game given its start board, encoded moves and winner"""
+        self.games.write(_GAME.pack(pack_position(start), self.offset, len(moves),
+                                    RESULT_CODES[winner]))
+        self.moves.write(struct.pack("<{}H".format(len(moves)), *moves))
+        self.offset += len(moves)
+
+    def close(self):
+        self.games.close()
+        self.moves.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_games(path):
+    """Generate (start board, encoded moves, winner) for every stored game"""
+    with open(path, "rb") as games, open(path + MOVES_SUFFIX, "rb") as moves:
+        _check_header(games, GAME_MAGIC, GAME_SIZE, path)
+        _check_header(moves, GAME_MAGIC, MOVE_SIZE, path + MOVES_SUFFIX)
+        while True:
+            data = games.read(GAME_SIZE)
+            if len(data) < GAME_SIZE:
+                break
+            start, offset, plies, result = _GAME.unpack(data)
+            moves.seek(HEADER_SIZE + offset * MOVE_SIZE)
+            yield (unpack_position(start),
+                   list(struct.unpack("<{}H".format(plies), moves.read(plies * MOVE_SIZE))),
+                   RESULT_NAMES[result])
+
+
+# === Memory-mapped NumPy access ===
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("memory-mapped reading requires numpy (pip install numpy)")
+    return numpy
+
+
+def position_dtype():
+    """NumPy structured dtype of a packed position"""
+    np = _numpy()
+    return np.dtype([("occupied", "<u8"), ("pieces", "u1", (16,)), ("castle_rooks", "<u2"),
+                     ("castling", "u1"), ("side", "u1"), ("ep", "u1"), ("halfmove", "u1"),
+                     ("fullmove", "<u2")])
+
+
+def game_dtype():
+    """NumPy structured dtype of a game record"""
+    np = _numpy()
+    return np.dtype([("start", position_dtype()), ("offset", "<u8"), ("plies", "<u2"),
+                     ("result", "u1"), ("reserved", "u1", (5,))])
+
+
+def _memmap(path, magic, dtype):
+    np = _numpy()
+    with open(path, "rb") as f:
+        _check_header(f, magic, dtype.itemsize, path)
+    if os.path.getsize(path) == HEADER_SIZE:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE)
+
+
+def open_positions(path):
+    """Position file as a read-only memory-mapped structured array"""
+    return _memmap(path, POSITION_MAGIC, position_dtype())
+
+
+def open_games(path):
+    """Game file as memory-mapped (games, moves) arrays
+
+    The moves of game i are moves[games["offset"][i]:][:games["plies"][i]].
+    """
+    np = _numpy()
+    return (_memmap(path, GAME_MAGIC, game_dtype()),
+            _memmap(path + MOVES_SUFFIX, GAME_MAGIC, np.dtype("<u2")))
+
+
+def record_to_board(record):
+    """Board for one record of a position array"""
+    return unpack_position(record.tobytes())
+
+
+def squares_array(positions):
+    """N x 64 uint8 array of the piece code on every square"""
+    np = _numpy()
+    positions = np.asarray(positions)
+    n = len(positions)
+    occupied = np.unpackbits(positions["occupied"].astype("<u8").view(np.uint8).reshape(n, 8),
+                             axis=1, bitorder="little").astype(bool)
+    pieces = positions["pieces"]
+    # nibbles in storage order: low nibble of each byte first
+    codes = np.empty((n, 32), dtype=np.uint8)
+    codes[:, 0::2] = pieces & 15
+    codes[:, 1::2] = pieces >> 4
+    # the k-th occupied square holds the k-th stored code
+    index = np.clip(np.cumsum(occupied, axis=1) - 1, 0, 31)
+    return np.where(occupied, np.take_along_axis(codes, index, axis=1), 0).astype(np.uint8)
+
+
+def piece_planes(positions):
+    """N x 12 x 64 uint8 piece planes in evaluate.PLANE_PIECES order"""
+    from evaluate import PLANE_PIECES
+    np = _numpy()
+    squares = squares_array(positions)
+    return (squares[:, None, :] == np.array(PLANE_PIECES, dtype=np.uint8)[None, :, None]
+            ).astype(np.uint8)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and inspect binary position and game files")
+    commands = parser.add_subparsers(dest="command")
+    command = commands.add_parser("pack-fens", help="pack a FEN/EPD file into a position file")
+    command.add_argument("source")
+    command.add_argument("output")
+    command = commands.add_parser("pack-pgn", help="pack a PGN archive into a game file")
+    command.add_argument("source")
+    command.add_argument("output")
+    command = commands.add_parser("info", help="count the records of a position or game file")
+    command.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack-fens":
+        from fen import read_fens
+        count = write_positions(args.output, read_fens(args.source, reuse=True))
+        print("{} positions written to {}".format(count, args.output))
+    elif args.command == "pack-pgn":
+        from pgn import read_games as read_pgn, RESULTS
+        winners = {token: name for name, token in RESULTS.items()}
+        count = errors = 0
+        with GameWriter(args.output) as writer:
+            for game in read_pgn(args.source):
+                try:
+                    moves = game.encoded_moves()
+                except ValueError as e:
+                    errors += 1
+                    print("skipped game: {}".format(e), file=sys.stderr)
+                    continue
+                writer.write(game.start_board(), moves, winners.get(game.result, ""))
+                count += 1
+        print("{} games written to {} ({} skipped)".format(count, args.output, errors))
+    elif args.command == "info":
+        with open(args.path, "rb") as f:
+            magic = f.read(8)
+        size = os.path.getsize(args.path) - HEADER_SIZE
+        if magic == POSITION_MAGIC:
+            print("{}: {} positions".format(args.path, size // POSITION_SIZE))
+        elif magic == GAME_MAGIC:
+            moves = os.path.getsize(args.path + MOVES_SUFFIX) - HEADER_SIZE
+            print("{}: {} games, {} moves".format(args.path, size // GAME_SIZE, moves // MOVE_SIZE))
+        else:
+            print("{}: unknown file type".format(args.path))
+            return 1
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
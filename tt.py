@@ -0,0 +1,122 @@
+"""Fixed-size transposition table.
+
+The table is two preallocated arrays of unsigned 64-bit ints (keys and
+packed entries), so its memory footprint is set once from a MB budget and
+never grows. Each bucket has two slots: the first keeps the deepest
+result seen for the bucket (depth-preferred), the second takes everything
+else (always-replace).
+"""
+
+from array import array
+
+# bound types
+BOUND_NONE = 0
+BOUND_LOWER = 1
+BOUND_UPPER = 2
+BOUND_EXACT = 3
+
+# bytes per slot: 8 for the key, 8 for the packed entry
+SLOT_SIZE = 16
+SLOTS_PER_BUCKET = 2
+
+# packed entry layout:
+#   bits  0-15  best move (0 = none)
+#   bits 16-47  score + SCORE_OFFSET
+#   bits 48-55  depth
+#   bits 56-57  bound type
+#   bits 58-63  generation of the search that stored it
+SCORE_OFFSET = 1 << 31
+_MOVE_MASK = 0xFFFF
+_SCORE_MASK = 0xFFFFFFFF
+_GENERATION_MASK = 0x3F
+
+
+class TranspositionTable(object):
+    def __init__(self, size_mb=16):
+        # number of buckets, rounded down to a power of two so a bucket can
+        # be picked with a mask
+        buckets = max(1, (size_mb * 1024 * 1024) // (SLOT_SIZE * SLOTS_PER_BUCKET))
+        buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = buckets - 1
+        self.keys = array("Q", [0]) * (buckets * SLOTS_PER_BUCKET)
+        self.entries = array("Q", [0]) * (buckets * SLOTS_PER_BUCKET)
+        # incremented for every new search so stale entries can be replaced
+        self.generation = 0
+        # statistics
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def size_bytes(self):
+        return len(self.keys) * SLOT_SIZE
+
+    def clear(self):
+        n = len(self.keys)
+        self.keys = array("Q", [0]) * n
+        self.entries = array("Q", [0]) * n
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & _GENERATION_MASK
+
+    def probe(self, key):
+        """Look up a position hash
+
+        Returns (depth, score, bound, move) or None if the position is not
+        stored.
+        """
+        self.probes += 1
+        i = (key & self.mask) << 1
+        keys = self.keys
+        if keys[i] == key:
+            data = self.entries[i]
+        elif keys[i + 1] == key:
+            data = self.entries[i + 1]
+        else:
+            return None
+        self.hits += 1
+        return ((data >> 48) & 0xFF,
+                ((data >> 16) & _SCORE_MASK) - SCORE_OFFSET,
+                (data >> 56) & 3,
+                data & _MOVE_MASK)
+
+    def store(self, key, depth, score, bound, move=0):
+        i = (key & self.mask) << 1
+        keys = self.keys
+        entries = self.entries
+        data = ((move & _MOVE_MASK)
+                | ((score + SCORE_OFFSET) & _SCORE_MASK) << 16
+                | min(depth, 255) << 48
+                | bound << 56
+                | self.generation << 58)
+
+        # the depth-preferred slot takes the entry if it already holds this
+        # position, is shallower, or was left over from an earlier search
+        old = entries[i]
+        if (keys[i] == key or depth >= (old >> 48) & 0xFF
+                or old >> 58 != self.generation):
+            if keys[i] == key:
+                # keep the best move when re-storing a position without one
+                if not move:
+                    data |= old & _MOVE_MASK
+            else:
+                # demote the previous occupant to the always-replace slot,
+                # which also drops any older copy of this position there
+                keys[i + 1] = keys[i]
+                entries[i + 1] = old
+            keys[i] = key
+            entries[i] = data
+        else:
+            if not move and keys[i + 1] == key:
+                data |= entries[i + 1] & _MOVE_MASK
+            keys[i + 1] = key
+            entries[i + 1] = data
+
+    def hashfull(self):
+        # per mille of the first 1000 slots used by the current search
+        n = min(1000, len(self.keys))
+        used = sum(1 for i in range(n)
+                   if self.keys[i] and self.entries[i] >> 58 == self.generation)
+        return used * 1000 // n
@@ -1,23 +1,18 @@
 import pygame
 from pygame.locals import *
-import queue
 
 class Utils:
+    def __init__(self):
+        # position of the left click being handled, set by the game loop
+        # from MOUSEBUTTONDOWN events
+        self.click = None
+
     def get_mouse_event(self):
-        # get coordinates of the mouse
-        position = pygame.mouse.get_pos()
-        
-        # return left click status and mouse coordinates
-        return position
+        # coordinates of the click, or of the mouse if there is none
+        if self.click is not None:
+            return self.click
+        return pygame.mouse.get_pos()
 
     def left_click_event(self):
-        # store mouse buttons
-        mouse_btn = pygame.mouse.get_pressed()
-        # create flag to check for left click event
-        left_click = False
-
-        if mouse_btn[0]: #and e.button == 1:
-            # change left click flag
-            left_click = True
-
-        return left_click
\ No newline at end of file
+        # True while a left click is being handled
+        return self.click is not None
@@ -0,0 +1,22 @@
+"""Zobrist keys for position hashing.
+
+A position hash is the xor of one key per piece on its square, plus keys
+for the side to move, the castling rights and the en passant file, so it
+can be updated in O(1) as pieces move.
+"""
+
+import random
+
+# fixed seed so hashes are stable between runs and processes
+_rng = random.Random(0x5EED960)
+
+# PIECE_KEYS[piece code][square]; rows for unused piece codes stay zero
+PIECE_KEYS = tuple(
+    tuple(_rng.getrandbits(64) for sq in range(64)) if piece & 7 else (0,) * 64
+    for piece in range(16))
+# xor-ed in when black is to move
+SIDE_KEY = _rng.getrandbits(64)
+# one key per combination of the four castling rights
+CASTLING_KEYS = (0,) + tuple(_rng.getrandbits(64) for rights in range(1, 16))
+# one key per en passant file
+EP_KEYS = tuple(_rng.getrandbits(64) for file in range(8))